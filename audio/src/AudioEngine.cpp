@@ -24,44 +24,75 @@
 #ifdef LINK_PLATFORM_WINDOWS
 #define _USE_MATH_DEFINES
 #endif
+#include <algorithm>
 #include <cmath>
+#include <iostream>
+#include <thread>
 
 namespace ableton
 {
 namespace linkaudio
 {
 
+namespace
+{
+
+// Only the audio thread writes the stats, so no read-modify-write is needed
+template <typename T>
+void add(std::atomic<T> &value, const T delta)
+{
+    value.store(value.load(std::memory_order_relaxed) + delta, std::memory_order_relaxed);
+}
+
+} // namespace
+
 AudioEngine::AudioEngine(Link &link)
     : mLink(link)
     , mSampleRate(44100.)
     , mOutputLatency(0)
-    , mSharedEngineData({0., false, false, 4., std::chrono::microseconds(0)})
+    , mSharedEngineData({0., 0, 0, 0, 4., std::chrono::microseconds(0)})
+    , mEngineData(mSharedEngineData)
+    , mTempoRequest(0)
+    , mStartRequest(0)
+    , mStopRequest(0)
     , mIsPlaying(false)
-    , mTimeAtLastClick{}
+    , mOffline(false)
+    , mRenderStats{}
+    , mInCallback(false)
+    , mStats{}
+    , mClick(nullptr)
+    , mClickPosition(0)
 {
+    createClicks();
+    mScheduled.reserve(4096);
 }
 
 void AudioEngine::startPlaying(bool metronome)
 {
     std::lock_guard<std::mutex> lock(mEngineDataGuard);
-    mSharedEngineData.requestStart = true;
+    ++mSharedEngineData.startRequest;
     mSharedEngineData.metronome = metronome;
+    pushEngineData();
 }
 
 void AudioEngine::stopPlaying()
 {
     std::lock_guard<std::mutex> lock(mEngineDataGuard);
-    mSharedEngineData.requestStop = true;
+    ++mSharedEngineData.stopRequest;
+    pushEngineData();
 }
 
 void AudioEngine::setTempo(double tempo)
 {
     std::lock_guard<std::mutex> lock(mEngineDataGuard);
     mSharedEngineData.requestedTempo = tempo;
+    ++mSharedEngineData.tempoRequest;
+    pushEngineData();
 }
 
 double AudioEngine::quantum() const
 {
+    std::lock_guard<std::mutex> lock(mEngineDataGuard);
     return mSharedEngineData.quantum;
 }
 
@@ -69,10 +100,12 @@ void AudioEngine::setQuantum(double quantum)
 {
     std::lock_guard<std::mutex> lock(mEngineDataGuard);
     mSharedEngineData.quantum = quantum;
+    pushEngineData();
 }
 
 std::chrono::microseconds AudioEngine::latency() const
 {
+    std::lock_guard<std::mutex> lock(mEngineDataGuard);
     return mSharedEngineData.latency;
 }
 
@@ -80,10 +113,12 @@ void AudioEngine::setLatency(std::chrono::microseconds latency)
 {
     std::lock_guard<std::mutex> lock(mEngineDataGuard);
     mSharedEngineData.latency = latency;
+    pushEngineData();
 }
 
 double AudioEngine::swing() const
 {
+    std::lock_guard<std::mutex> lock(mEngineDataGuard);
     return mSharedEngineData.swing;
 }
 
@@ -91,58 +126,279 @@ void AudioEngine::setSwing(double swing)
 {
     std::lock_guard<std::mutex> lock(mEngineDataGuard);
     mSharedEngineData.swing = swing;
+    pushEngineData();
 }
 
-void AudioEngine::setEvents(std::vector<std::tuple<int, int, int, int, int, int>> &events)
+AudioEngine::Step AudioEngine::compileStep(const std::vector<Event> &events)
 {
+    Step step;
+    for (auto const &e : events)
+    {
+        const auto tone = std::get<1>(e) & 0xff;
+        const auto trigger = std::get<1>(e) >> 8;
+        step.events.emplace_back(std::get<0>(e), tone, std::get<2>(e), std::get<3>(e), std::get<4>(e), std::get<5>(e));
+        if (tone > 0 && tone < 128)
+        {
+            const auto retrigger = Event{std::get<0>(e), tone, std::get<2>(e), std::get<3>(e), 0, 0};
+            if (trigger == 1)
+            {
+                step.retriggers32.push_back(retrigger);
+            }
+            else if (trigger == 2)
+            {
+                step.retriggers24.push_back(retrigger);
+            }
+        }
+    }
+    return step;
+}
+
+void AudioEngine::setPattern(const std::size_t track, const std::size_t index, const std::size_t length, Pattern &pattern)
+{
+    std::sort(pattern.begin(), pattern.end(), [](auto const &a, auto const &b) { return a.first < b.first; });
+    auto compiled = std::make_shared<CompiledPattern>();
+    compiled->length = length;
+    for (auto const &p : pattern)
+    {
+        if (p.first < length && !p.second.empty())
+        {
+            compiled->indices.push_back(p.first);
+            compiled->steps.push_back(compileStep(p.second));
+        }
+    }
     std::lock_guard<std::mutex> lock(mEngineDataGuard);
-    mSharedEngineData.events = events;
+    auto schedule = mSharedEngineData.schedule ? std::make_shared<Schedule>(*mSharedEngineData.schedule) : std::make_shared<Schedule>();
+    if (schedule->size() <= track)
+    {
+        schedule->resize(track + 1);
+    }
+    auto &patterns = (*schedule)[track].patterns;
+    if (patterns.size() <= index)
+    {
+        patterns.resize(index + 1);
+    }
+    patterns[index] = std::move(compiled);
+    mSharedEngineData.schedule = std::move(schedule);
+    pushEngineData();
 }
 
-void AudioEngine::setBufferSize(unsigned long size)
+void AudioEngine::setSteps(const std::size_t track, const std::size_t index, Pattern &steps)
 {
-    mBufferSize = size;
+    std::lock_guard<std::mutex> lock(mEngineDataGuard);
+    if (!mSharedEngineData.schedule || mSharedEngineData.schedule->size() <= track ||
+        (*mSharedEngineData.schedule)[track].patterns.size() <= index ||
+        !(*mSharedEngineData.schedule)[track].patterns[index])
+    {
+        return;
+    }
+    auto schedule = std::make_shared<Schedule>(*mSharedEngineData.schedule);
+    auto &pattern = (*schedule)[track].patterns[index];
+    auto compiled = std::make_shared<CompiledPattern>(*pattern);
+    for (auto const &p : steps)
+    {
+        auto it = std::lower_bound(compiled->indices.begin(), compiled->indices.end(), p.first);
+        auto step = compiled->steps.begin() + (it - compiled->indices.begin());
+        const auto found = it != compiled->indices.end() && *it == p.first;
+        if (p.second.empty() || p.first >= compiled->length)
+        {
+            if (found)
+            {
+                compiled->indices.erase(it);
+                compiled->steps.erase(step);
+            }
+        }
+        else if (found)
+        {
+            *step = compileStep(p.second);
+        }
+        else
+        {
+            compiled->steps.insert(step, compileStep(p.second));
+            compiled->indices.insert(it, p.first);
+        }
+    }
+    pattern = std::move(compiled);
+    mSharedEngineData.schedule = std::move(schedule);
+    pushEngineData();
 }
 
-void AudioEngine::setSampleRate(double sampleRate)
+bool AudioEngine::sendEvents(const std::vector<Event> &events)
 {
-    mSampleRate = sampleRate;
+    // Called with the GIL held, so there is only one writer. The events are sent
+    // all or none, so no chord or note off is sent partially.
+    if (events.size() > mCommands.space())
+    {
+        std::cerr << "Command queue full, " << events.size() << " events dropped." << std::endl;
+        return false;
+    }
+    const auto time = mLink.clock().micros();
+    for (auto const &e : events)
+    {
+        mCommands.push(Command{time, e});
+    }
+    return true;
 }
 
-AudioEngine::EngineData AudioEngine::pullEngineData()
+void AudioEngine::sendCommands(const std::chrono::microseconds beginHostTime,
+                               const uint32_t beginTicks,
+                               const std::size_t numSamples)
 {
-    auto engineData = EngineData{};
-    if (mEngineDataGuard.try_lock())
+    using namespace std::chrono;
+
+    // A command sent at any time during a buffer is played one buffer period plus
+    // the output latency later, earlier commands as soon as possible
+    const auto microsPerSample = 1e6 / mSampleRate;
+    const auto period = microseconds(llround(numSamples * microsPerSample));
+    const auto delay = mOutputLatency + period;
+    const auto ticksPerSecond = sv_get_ticks_per_second();
+
+    auto locked = false;
+    while (auto const command = mCommands.front())
     {
-        engineData.requestedTempo = mSharedEngineData.requestedTempo;
-        mSharedEngineData.requestedTempo = 0;
+        const auto offset = std::max(command->time + delay - beginHostTime, microseconds(0));
+        if (offset >= period)
+        {
+            break;
+        }
+        if (!locked)
+        {
+            sv_lock_slot(0);
+            locked = true;
+        }
+        auto const &e = command->event;
+        sv_set_event_t(0, 1, beginTicks + uint32_t(round((offset.count() * ticksPerSecond) / 1e6)));
+        sv_send_event(0, std::get<0>(e), std::get<1>(e), std::get<2>(e), std::get<3>(e), std::get<4>(e), std::get<5>(e));
+        mCommands.pop();
+    }
+    if (locked)
+    {
+        sv_set_event_t(0, 0, 0);
+        sv_unlock_slot(0);
+    }
+}
 
-        engineData.requestStart = mSharedEngineData.requestStart;
-        mSharedEngineData.requestStart = false;
+void AudioEngine::setSequence(const std::size_t track, std::vector<int> &sequence)
+{
+    std::lock_guard<std::mutex> lock(mEngineDataGuard);
+    auto schedule = mSharedEngineData.schedule ? std::make_shared<Schedule>(*mSharedEngineData.schedule) : std::make_shared<Schedule>();
+    if (schedule->size() <= track)
+    {
+        schedule->resize(track + 1);
+    }
+    (*schedule)[track].sequence = std::move(sequence);
+    mSharedEngineData.schedule = std::move(schedule);
+    pushEngineData();
+}
 
-        engineData.requestStop = mSharedEngineData.requestStop;
-        mSharedEngineData.requestStop = false;
+void AudioEngine::setResolution(const std::size_t track, const int resolution)
+{
+    std::lock_guard<std::mutex> lock(mEngineDataGuard);
+    auto schedule = mSharedEngineData.schedule ? std::make_shared<Schedule>(*mSharedEngineData.schedule) : std::make_shared<Schedule>();
+    if (schedule->size() <= track)
+    {
+        schedule->resize(track + 1);
+    }
+    (*schedule)[track].resolution = std::max(resolution, 1);
+    mSharedEngineData.schedule = std::move(schedule);
+    pushEngineData();
+}
 
-        engineData.quantum = mSharedEngineData.quantum;
+double AudioEngine::sampleRate() const
+{
+    return mSampleRate;
+}
+
+unsigned long AudioEngine::bufferSize() const
+{
+    return mBufferSize;
+}
+
+std::chrono::microseconds AudioEngine::outputLatency() const
+{
+    return mOutputLatency;
+}
 
-        engineData.latency = mSharedEngineData.latency;
+void AudioEngine::setBufferSize(unsigned long size)
+{
+    mBufferSize = size;
+}
 
-        engineData.swing = mSharedEngineData.swing;
+void AudioEngine::setSampleRate(double sampleRate)
+{
+    mSampleRate = sampleRate;
+    createClicks();
+}
 
-        engineData.events = mSharedEngineData.events;
+void AudioEngine::pushEngineData()
+{
+    // Called with mEngineDataGuard held, this is the only writer of mEngineData
+    mEngineData.back() = mSharedEngineData;
+    mEngineData.publish();
+}
 
-        engineData.metronome = mSharedEngineData.metronome;
+const AudioEngine::EngineData &AudioEngine::pullEngineData()
+{
+    return mEngineData.front();
+}
 
-        mEngineDataGuard.unlock();
+template <typename Callback>
+void AudioEngine::forEachStep(const Track &track,
+                               const double quantum,
+                               const long long begin,
+                               const long long end,
+                               Callback callback)
+{
+    // The sequence of a track loops, each pattern is played for its length. Steps
+    // are counted at the resolution of the track, patterns without events last
+    // one quantum.
+    const auto length = [&](const int index) -> std::size_t {
+        if (index >= 0 && static_cast<std::size_t>(index) < track.patterns.size() && track.patterns[index])
+        {
+            return track.patterns[index]->length;
+        }
+        return std::max(1ll, llround(quantum * track.resolution));
+    };
+    long long loop = 0;
+    for (auto const index : track.sequence)
+    {
+        loop += length(index);
+    }
+    if (loop == 0)
+    {
+        return;
     }
 
-    return engineData;
+    for (auto tick = std::max(begin, 0ll); tick < end;)
+    {
+        // Find the pattern played at the tick, and the steps up to its end
+        auto position = static_cast<std::size_t>(tick % loop);
+        std::size_t i = 0;
+        while (position >= length(track.sequence[i]))
+        {
+            position -= length(track.sequence[i++]);
+        }
+        const auto index = track.sequence[i];
+        const auto next = std::min(end, tick + static_cast<long long>(length(index) - position));
+        if (index >= 0 && static_cast<std::size_t>(index) < track.patterns.size() && track.patterns[index])
+        {
+            // Only the non-empty steps are visited
+            auto const &pattern = *track.patterns[index];
+            const auto last = position + static_cast<std::size_t>(next - tick);
+            for (auto it = std::lower_bound(pattern.indices.begin(), pattern.indices.end(), position);
+                 it != pattern.indices.end() && *it < last; ++it)
+            {
+                callback(tick + static_cast<long long>(*it - position), pattern.steps[it - pattern.indices.begin()]);
+            }
+        }
+        tick = next;
+    }
 }
 
-void AudioEngine::createSunvoxEvents(const Link::SessionState sessionState,
+template <typename SessionState>
+void AudioEngine::createSunvoxEvents(const SessionState &sessionState,
                                      const double quantum,
                                      const double swing,
-                                     const std::vector<std::tuple<int, int, int, int, int, int>> &events,
+                                     const Schedule &schedule,
                                      const std::chrono::microseconds beginHostTime,
                                      const uint32_t beginTicks,
                                      const std::size_t numSamples)
@@ -152,69 +408,84 @@ void AudioEngine::createSunvoxEvents(const Link::SessionState sessionState,
     const auto microsPerSample = 1e6 / mSampleRate;
     const auto ticksPerSecond = sv_get_ticks_per_second();
     const auto maxTime = beginHostTime + microseconds(llround(numSamples * microsPerSample));
+    const auto beginBeat = sessionState.beatAtTime(beginHostTime, quantum);
+    const auto endBeat = sessionState.beatAtTime(maxTime, quantum);
 
-    long long beat = std::max(0., sessionState.beatAtTime(beginHostTime, quantum) * 4.);
-    for (;;)
+    // Collect the events of the steps starting within the buffer, which only
+    // depends on the number of non-empty steps, not on the resolution
+    mScheduled.clear();
+    for (auto const &track : schedule)
     {
-        const auto timeAtBeat = sessionState.timeAtBeat(beat / 4., quantum);
-        const auto swingTimeAtBeat = (beat % 2) == 1 ? sessionState.timeAtBeat((beat + swing) / 4., quantum) : timeAtBeat;
-
-        if (timeAtBeat >= maxTime)
-        {
-            break;
-        }
-
-        if (timeAtBeat >= beginHostTime && !events.empty())
-        {
-            const auto timeAtBeat_1_32 = sessionState.timeAtBeat((beat + .5) / 4., quantum);
-            const auto timeAtBeat_1_24 = sessionState.timeAtBeat((beat + 2./3.) / 4., quantum);
-            const auto timeAtBeat_2_24 = sessionState.timeAtBeat((beat + 4./3.) / 4., quantum);
-
-            sv_lock_slot(0);
-
-            sv_set_event_t(0, 1, beginTicks + uint32_t(round(((swingTimeAtBeat - beginHostTime).count() * ticksPerSecond) / 1e6)));
-            for (auto const &e : events)
+        const auto resolution = static_cast<double>(track.resolution);
+        const auto begin = static_cast<long long>(floor(beginBeat * resolution));
+        const auto end = static_cast<long long>(ceil(endBeat * resolution)) + 1;
+        forEachStep(track, quantum, begin, end, [&](const long long tick, const Step &step) {
+            const auto timeAtTick = sessionState.timeAtBeat(tick / resolution, quantum);
+            if (timeAtTick < beginHostTime || timeAtTick >= maxTime)
             {
-                sv_send_event(0, std::get<0>(e), std::get<1>(e) & 0xff, std::get<2>(e), std::get<3>(e), std::get<4>(e), std::get<5>(e));
+                return;
             }
-
-            sv_set_event_t(0, 1, beginTicks + uint32_t(round(((timeAtBeat_1_32 - beginHostTime).count() * ticksPerSecond) / 1e6)));
-            for (auto const &e : events)
-            {
-                const auto tone = std::get<1>(e) & 0xff;
-                const auto trigger = std::get<1>(e) >> 8;
-                if (trigger == 1 && tone > 0 && tone < 128) {
-                    sv_send_event(0, std::get<0>(e), tone, std::get<2>(e), std::get<3>(e), 0, 0);
+            const auto scheduleAt = [&](const microseconds time, const std::vector<Event> &events) {
+                for (auto const &e : events)
+                {
+                    mScheduled.emplace_back(time, mScheduled.size(), &e);
                 }
-            }
-
-            sv_set_event_t(0, 1, beginTicks + uint32_t(round(((timeAtBeat_1_24 - beginHostTime).count() * ticksPerSecond) / 1e6)));
-            for (auto const &e : events)
+            };
+            scheduleAt((tick % 2) == 1 ? sessionState.timeAtBeat((tick + swing) / resolution, quantum) : timeAtTick, step.events);
+            if (!step.retriggers32.empty())
             {
-                const auto tone = std::get<1>(e) & 0xff;
-                const auto trigger = std::get<1>(e) >> 8;
-                if (trigger == 2 && tone > 0 && tone < 128) {
-                    sv_send_event(0, std::get<0>(e), tone, std::get<2>(e), std::get<3>(e), 0, 0);
-                }
+                scheduleAt(sessionState.timeAtBeat((tick + .5) / resolution, quantum), step.retriggers32);
             }
-
-            sv_set_event_t(0, 1, beginTicks + uint32_t(round(((timeAtBeat_2_24 - beginHostTime).count() * ticksPerSecond) / 1e6)));
-            for (auto const &e : events)
+            if (!step.retriggers24.empty())
             {
-                const auto tone = std::get<1>(e) & 0xff;
-                const auto trigger = std::get<1>(e) >> 8;
-                if (trigger == 2 && tone > 0 && tone < 128) {
-                    sv_send_event(0, std::get<0>(e), tone, std::get<2>(e), std::get<3>(e), 0, 0);
-                }
+                scheduleAt(sessionState.timeAtBeat((tick + 2. / 3.) / resolution, quantum), step.retriggers24);
+                scheduleAt(sessionState.timeAtBeat((tick + 4. / 3.) / resolution, quantum), step.retriggers24);
             }
+        });
+    }
+    if (mScheduled.empty())
+    {
+        return;
+    }
 
-            sv_set_event_t(0, 0, 0);
-            sv_unlock_slot(0);
+    std::sort(mScheduled.begin(), mScheduled.end());
+    sv_lock_slot(0);
+    auto time = microseconds::min();
+    for (auto const &scheduled : mScheduled)
+    {
+        if (std::get<0>(scheduled) != time)
+        {
+            time = std::get<0>(scheduled);
+            sv_set_event_t(0, 1, beginTicks + uint32_t(round(((time - beginHostTime).count() * ticksPerSecond) / 1e6)));
         }
-        beat += 1;
+        auto const &e = *std::get<2>(scheduled);
+        sv_send_event(0, std::get<0>(e), std::get<1>(e), std::get<2>(e), std::get<3>(e), std::get<4>(e), std::get<5>(e));
     }
+    sv_set_event_t(0, 0, 0);
+    sv_unlock_slot(0);
 }
 
+void AudioEngine::createClicks()
+{
+  // Metronome frequencies
+  static const double highTone = 1567.98;
+  static const double lowTone = 1108.73;
+  // 100ms click duration
+  static const double clickDuration = 0.1;
+
+  const auto length = static_cast<std::size_t>(ceil(clickDuration * mSampleRate));
+  mHighClick.resize(length);
+  mLowClick.resize(length);
+  for (std::size_t i = 0; i < length; ++i)
+  {
+    const auto secondsAfterClick = static_cast<double>(i) / mSampleRate;
+    // Simple cosine synth
+    const auto envelope = 1 - sin(5 * M_PI * secondsAfterClick);
+    mHighClick[i] = static_cast<float>(cos(2 * M_PI * secondsAfterClick * highTone) * envelope);
+    mLowClick[i] = static_cast<float>(cos(2 * M_PI * secondsAfterClick * lowTone) * envelope);
+  }
+  mClick = nullptr;
+}
 
 void AudioEngine::renderMetronomeIntoBuffer(const Link::SessionState sessionState,
   const double quantum,
@@ -224,76 +495,171 @@ void AudioEngine::renderMetronomeIntoBuffer(const Link::SessionState sessionStat
 {
   using namespace std::chrono;
 
-  // Metronome frequencies
-  static const double highTone = 1567.98;
-  static const double lowTone = 1108.73;
-  // 100ms click duration
-  static const auto clickDuration = duration<double>{0.1};
-
   // The number of microseconds that elapse between samples
   const auto microsPerSample = 1e6 / mSampleRate;
 
-  for (std::size_t i = 0; i < numSamples; ++i)
+  // Render the current click up to the given sample
+  std::size_t i = 0;
+  const auto renderClick = [&](const std::size_t end) {
+    for (; i < end && mClick && mClickPosition < mClick->size(); ++i)
+    {
+      const auto amplitude = (*mClick)[mClickPosition++];
+      buffer[2 * i] += amplitude;
+      buffer[2 * i + 1] += amplitude;
+    }
+    i = end;
+  };
+
+  // A click starts at the first sample at or after each beat. Negative beats are
+  // count-in beats and don't click. Beats starting at the sample before this buffer
+  // were not clicked by the last one.
+  const auto firstBeat = sessionState.beatAtTime(
+    beginHostTime - microseconds(llround(microsPerSample)), quantum);
+  const auto lastBeat = sessionState.beatAtTime(
+    beginHostTime + microseconds(llround(static_cast<double>(numSamples - 1) * microsPerSample)), quantum);
+  for (auto beat = std::max(floor(firstBeat) + 1, 0.); beat <= lastBeat; beat += 1)
   {
-    double amplitude = 0.;
-    // Compute the host time for this sample and the last.
-    const auto hostTime = beginHostTime + microseconds(llround(static_cast<double>(i) * microsPerSample));
-    const auto lastSampleHostTime = hostTime - microseconds(llround(microsPerSample));
-
-    // Only make sound for positive beat magnitudes. Negative beat
-    // magnitudes are count-in beats.
-    if (sessionState.beatAtTime(hostTime, quantum) >= 0.)
-    {
-      // If the phase wraps around between the last sample and the
-      // current one with respect to a 1 beat quantum, then a click
-      // should occur.
-      if (sessionState.phaseAtTime(hostTime, 1)
-          < sessionState.phaseAtTime(lastSampleHostTime, 1))
-      {
-        mTimeAtLastClick = hostTime;
-      }
-
-      const auto secondsAfterClick =
-        duration_cast<duration<double>>(hostTime - mTimeAtLastClick);
-
-      // If we're within the click duration of the last beat, render
-      // the click tone into this sample
-      if (secondsAfterClick < clickDuration)
-      {
-        // If the phase of the last beat with respect to the current
-        // quantum was zero, then it was at a quantum boundary and we
-        // want to use the high tone. For other beats within the
-        // quantum, use the low tone.
-        const auto freq =
-          floor(sessionState.phaseAtTime(hostTime, quantum)) == 0 ? highTone : lowTone;
-
-        // Simple cosine synth
-        amplitude = cos(2 * M_PI * secondsAfterClick.count() * freq)
-                    * (1 - sin(5 * M_PI * secondsAfterClick.count()));
-      }
-    }
-    buffer[2 * i] += amplitude;
-    buffer[2 * i + 1] += amplitude;
+    const auto offset = (sessionState.timeAtBeat(beat, quantum) - beginHostTime).count() / microsPerSample;
+    renderClick(std::min(static_cast<std::size_t>(std::max(ceil(offset), 0.)), numSamples));
+    // The click at a quantum boundary uses the high tone, other beats the low tone
+    mClick = fmod(beat, quantum) < 1 ? &mHighClick : &mLowClick;
+    mClickPosition = 0;
   }
+  renderClick(numSamples);
+}
+
+
+std::string AudioEngine::render(const double tempo, const double beats)
+{
+    using namespace std::chrono;
+
+    // Keep the real-time callback away from sunvox until rendering is done
+    mOffline = true;
+    while (mInCallback)
+    {
+        std::this_thread::yield();
+    }
+
+    EngineData engineData;
+    {
+        std::lock_guard<std::mutex> lock(mEngineDataGuard);
+        engineData = mSharedEngineData;
+    }
+
+    const OfflineTimeline timeline{tempo};
+    const auto ticksPerSecond = sv_get_ticks_per_second();
+    const auto totalSamples = llround(beats * 60. / tempo * mSampleRate);
+    const uint32_t beginTicks = sv_get_ticks();
+    std::vector<float> buffer(mBufferSize * 2);
+    std::string pcm;
+    pcm.reserve(totalSamples * 4);
+    mRenderStats = RenderStats{};
+
+    // Commands sent before rendering, e.g. the volume of the instruments, apply at once
+    while (auto const command = mCommands.front())
+    {
+        auto const &e = command->event;
+        sv_send_event(0, std::get<0>(e), std::get<1>(e), std::get<2>(e), std::get<3>(e), std::get<4>(e), std::get<5>(e));
+        mCommands.pop();
+    }
+
+    sv_stop(0);
+    for (long long sample = 0; sample < totalSamples; sample += mBufferSize)
+    {
+        const auto numSamples = std::size_t(std::min<long long>(mBufferSize, totalSamples - sample));
+        const auto time = microseconds(llround(sample * 1e6 / mSampleRate));
+        const auto ticks = beginTicks + uint32_t(llround(sample * ticksPerSecond / mSampleRate));
+        const auto start = steady_clock::now();
+        if (engineData.schedule)
+        {
+            createSunvoxEvents(timeline, engineData.quantum, engineData.swing, *engineData.schedule, time, ticks, numSamples);
+        }
+        const auto scheduled = steady_clock::now();
+        sv_audio_callback(buffer.data(), numSamples, 0, ticks);
+        const auto rendered = steady_clock::now();
+        mRenderStats.buffers += 1;
+        mRenderStats.events += duration<double>(scheduled - start).count();
+        mRenderStats.audio += duration<double>(rendered - scheduled).count();
+
+        // 16 bit little endian PCM
+        for (std::size_t i = 0; i < numSamples * 2; ++i)
+        {
+            const auto value = int16_t(lround(std::max(-1.f, std::min(1.f, buffer[i])) * 32767));
+            pcm.push_back(char(value & 0xff));
+            pcm.push_back(char((value >> 8) & 0xff));
+        }
+    }
+    sv_stop(0);
+
+    mOffline = false;
+    return pcm;
+}
+
+AudioEngine::RenderStats AudioEngine::renderStats() const
+{
+    return mRenderStats;
+}
+
+AudioEngine::Stats AudioEngine::stats() const
+{
+    Stats stats;
+    stats.callbacks = mStats.callbacks.load(std::memory_order_relaxed);
+    stats.underflows = mStats.underflows.load(std::memory_order_relaxed);
+    stats.callback = mStats.callback.load(std::memory_order_relaxed);
+    stats.maxCallback = mStats.maxCallback.load(std::memory_order_relaxed);
+    stats.events = mStats.events.load(std::memory_order_relaxed);
+    stats.audio = mStats.audio.load(std::memory_order_relaxed);
+    for (std::size_t i = 0; i < kHistogramSize; i++)
+    {
+        stats.histogram[i] = mStats.histogram[i].load(std::memory_order_relaxed);
+    }
+    return stats;
+}
+
+void AudioEngine::countUnderflow()
+{
+    add(mStats.underflows, std::size_t(1));
+}
+
+double AudioEngine::OfflineTimeline::beatAtTime(const std::chrono::microseconds time, double /*quantum*/) const
+{
+    return time.count() * tempo / 60e6;
+}
+
+std::chrono::microseconds AudioEngine::OfflineTimeline::timeAtBeat(const double beat, double /*quantum*/) const
+{
+    return std::chrono::microseconds(llround(beat * 60e6 / tempo));
 }
 
 
 void AudioEngine::audioCallback(
     const std::chrono::microseconds time, const std::size_t numSamples, float *buffer)
 {
-    const auto engineData = pullEngineData();
+    mInCallback = true;
+    if (mOffline)
+    {
+        std::fill(buffer, buffer + numSamples * 2, 0.f);
+        mInCallback = false;
+        return;
+    }
+
+    const auto start = std::chrono::steady_clock::now();
+
+    const auto &engineData = pullEngineData();
 
     const auto hostTime = time + engineData.latency;
 
     auto sessionState = mLink.captureAudioSessionState();
 
-    if (engineData.requestStart)
+    if (engineData.startRequest != mStartRequest)
     {
+        mStartRequest = engineData.startRequest;
         sessionState.setIsPlaying(true, hostTime);
     }
 
-    if (engineData.requestStop)
+    if (engineData.stopRequest != mStopRequest)
     {
+        mStopRequest = engineData.stopRequest;
         sessionState.setIsPlaying(false, hostTime);
     }
 
@@ -308,8 +674,9 @@ void AudioEngine::audioCallback(
         mIsPlaying = false;
     }
 
-    if (engineData.requestedTempo > 0)
+    if (engineData.tempoRequest != mTempoRequest)
     {
+        mTempoRequest = engineData.tempoRequest;
         // Set the newly requested tempo from the beginning of this buffer
         sessionState.setTempo(engineData.requestedTempo, hostTime);
     }
@@ -318,17 +685,43 @@ void AudioEngine::audioCallback(
     mLink.commitAudioSessionState(sessionState);
 
     const uint32_t ticks = sv_get_ticks();
+    const auto committed = std::chrono::steady_clock::now();
     if (mIsPlaying)
     {
         // As long as the engine is playing, generate sunvox events at the appropriate beats.
-        createSunvoxEvents(sessionState, engineData.quantum, engineData.swing, engineData.events, hostTime, ticks, numSamples);
+        if (engineData.schedule)
+        {
+            createSunvoxEvents(sessionState, engineData.quantum, engineData.swing, *engineData.schedule, hostTime, ticks, numSamples);
+        }
     }
+    sendCommands(time, ticks, numSamples);
+    const auto scheduled = std::chrono::steady_clock::now();
     sv_audio_callback(buffer, numSamples, 0, ticks);
+    const auto rendered = std::chrono::steady_clock::now();
 
     if (mIsPlaying && engineData.metronome)
     {
         renderMetronomeIntoBuffer(sessionState, engineData.quantum, hostTime, buffer, numSamples);
     }
+    else
+    {
+        mClick = nullptr;
+    }
+
+    using seconds = std::chrono::duration<double>;
+    const auto callback = seconds(std::chrono::steady_clock::now() - start).count();
+    const auto bucket = static_cast<std::size_t>(callback * mSampleRate / numSamples * 10.);
+    add(mStats.callbacks, std::size_t(1));
+    add(mStats.callback, callback);
+    add(mStats.events, seconds(scheduled - committed).count());
+    add(mStats.audio, seconds(rendered - scheduled).count());
+    add(mStats.histogram[std::min(bucket, kHistogramSize - 1)], std::size_t(1));
+    if (callback > mStats.maxCallback.load(std::memory_order_relaxed))
+    {
+        mStats.maxCallback.store(callback, std::memory_order_relaxed);
+    }
+
+    mInCallback = false;
 }
 
 } // namespace linkaudio
@@ -19,10 +19,19 @@
 
 #pragma once
 
+#include "CommandQueue.hpp"
+#include "TripleBuffer.hpp"
+
 // Make sure to define this before <cmath> is included for Windows
 #define _USE_MATH_DEFINES
 #include <ableton/Link.hpp>
+#include <array>
+#include <atomic>
+#include <memory>
+#include <string>
 #include <mutex>
+#include <tuple>
+#include <vector>
 
 namespace ableton
 {
@@ -32,6 +41,11 @@ namespace linkaudio
 class AudioEngine
 {
 public:
+    // (track_num, note + trigger * 256, vel, module, ctl, ctl_val)
+    using Event = std::tuple<int, int, int, int, int, int>;
+    // events of the non-empty steps of a pattern, by step
+    using Pattern = std::vector<std::pair<std::size_t, std::vector<Event>>>;
+
     AudioEngine(Link &link);
     void startPlaying(bool metronome);
     void stopPlaying();
@@ -42,34 +56,119 @@ public:
     void setLatency(std::chrono::microseconds latency);
     double swing() const;
     void setSwing(double swing);
-    void setEvents(std::vector<std::tuple<int, int, int, int, int, int>> &events);
+    void setPattern(std::size_t track, std::size_t index, std::size_t length, Pattern &pattern);
+    // Replaces some steps of a pattern set before, steps without events are removed
+    void setSteps(std::size_t track, std::size_t index, Pattern &steps);
+    void setSequence(std::size_t track, std::vector<int> &sequence);
+    // Steps per beat of a track
+    void setResolution(std::size_t track, int resolution);
+    // Queues events, which the audio thread sends to sunvox one buffer period after
+    // they were queued, keeping their timing. Returns false, and queues none of the
+    // events, if they do not fit into the queue.
+    bool sendEvents(const std::vector<Event> &events);
+    double sampleRate() const;
+    unsigned long bufferSize() const;
+    std::chrono::microseconds outputLatency() const;
+    std::string render(double tempo, double beats);
+
+    // Timings of the last offline render, in seconds
+    struct RenderStats
+    {
+        std::size_t buffers;
+        double events;
+        double audio;
+    };
+    RenderStats renderStats() const;
+
+    // Timings of the audio callback since the engine was created, in seconds
+    static constexpr std::size_t kHistogramSize = 11;
+    struct Stats
+    {
+        std::size_t callbacks;
+        std::size_t underflows;
+        double callback;
+        double maxCallback;
+        double events;
+        double audio;
+        // callbacks by duration relative to the buffer period, in steps of 10%,
+        // the last one counts callbacks exceeding it
+        std::array<std::size_t, kHistogramSize> histogram;
+    };
+    Stats stats() const;
+    void countUnderflow();
 
 private:
+    // Events of a step, partitioned by when they are sent: all events at the step,
+    // retriggered tones after 1/2 step (trigger 1) and after 2/3 and 4/3 steps
+    // (trigger 2), i.e. at 1/32 and at 1/24 and 2/24 at a resolution of 1/16
+    struct Step
+    {
+        std::vector<Event> events;
+        std::vector<Event> retriggers32;
+        std::vector<Event> retriggers24;
+    };
+
+    // Only the non-empty steps of a pattern are kept, ordered by step
+    struct CompiledPattern
+    {
+        std::size_t length;
+        std::vector<std::size_t> indices;
+        std::vector<Step> steps;
+    };
+
+    struct Track
+    {
+        std::vector<std::shared_ptr<const CompiledPattern>> patterns;
+        std::vector<int> sequence;
+        int resolution = 4;
+    };
+
+    // Immutable once shared with the audio thread, edits are copy-on-write
+    using Schedule = std::vector<Track>;
+
+    // One-shot requests are counters, the audio thread acts whenever they change
     struct EngineData
     {
         double requestedTempo;
-        bool requestStart;
-        bool requestStop;
+        unsigned tempoRequest;
+        unsigned startRequest;
+        unsigned stopRequest;
         double quantum;
         std::chrono::microseconds latency;
         double swing;
-        std::vector<std::tuple<int, int, int, int, int, int>> events;
+        std::shared_ptr<const Schedule> schedule;
         bool metronome;
     };
 
+    static Step compileStep(const std::vector<Event> &events);
     void setBufferSize(unsigned long size);
     void setSampleRate(double sampleRate);
-    EngineData pullEngineData();
+    void pushEngineData();
+    const EngineData &pullEngineData();
     void audioCallback(std::chrono::microseconds hostTime,
                        std::size_t numSamples,
                        float *buffer);
-    void createSunvoxEvents(Link::SessionState sessionState,
+    // Fixed tempo timeline starting at beat 0, used instead of Link when rendering offline
+    struct OfflineTimeline
+    {
+        double tempo;
+
+        double beatAtTime(std::chrono::microseconds time, double quantum) const;
+        std::chrono::microseconds timeAtBeat(double beat, double quantum) const;
+    };
+
+    template <typename SessionState>
+    void createSunvoxEvents(const SessionState &sessionState,
                             double quantum,
                             double swing,
-                            const std::vector<std::tuple<int, int, int, int, int, int>> &events,
+                            const Schedule &schedule,
                             std::chrono::microseconds beginHostTime,
                             uint32_t beginTicks,
                             std::size_t numSamples);
+    template <typename Callback>
+    void forEachStep(const Track &track, double quantum, long long begin, long long end, Callback callback);
+    void sendCommands(std::chrono::microseconds beginHostTime, uint32_t beginTicks, std::size_t numSamples);
+    void createClicks();
     void renderMetronomeIntoBuffer(Link::SessionState sessionState,
                                    double quantum,
                                    std::chrono::microseconds beginHostTime,
@@ -81,9 +180,40 @@ private:
     std::chrono::microseconds mOutputLatency;
     unsigned long mBufferSize;
     EngineData mSharedEngineData;
+    TripleBuffer<EngineData> mEngineData;
+    unsigned mTempoRequest;
+    unsigned mStartRequest;
+    unsigned mStopRequest;
     bool mIsPlaying;
-    std::mutex mEngineDataGuard;
-    std::chrono::microseconds mTimeAtLastClick;
+    mutable std::mutex mEngineDataGuard;
+    std::atomic<bool> mOffline;
+    RenderStats mRenderStats;
+    std::atomic<bool> mInCallback;
+    struct Command
+    {
+        std::chrono::microseconds time;
+        Event event;
+    };
+    CommandQueue<Command, 1024> mCommands;
+    // Events of the current buffer ordered by time, reused to not allocate in the
+    // audio thread
+    std::vector<std::tuple<std::chrono::microseconds, std::size_t, const Event *>> mScheduled;
+    // Written by the audio thread only, read by any thread
+    struct AtomicStats
+    {
+        std::atomic<std::size_t> callbacks;
+        std::atomic<std::size_t> underflows;
+        std::atomic<double> callback;
+        std::atomic<double> maxCallback;
+        std::atomic<double> events;
+        std::atomic<double> audio;
+        std::array<std::atomic<std::size_t>, kHistogramSize> histogram;
+    } mStats;
+    // Wavetables of the metronome clicks, and the position in the click being played
+    std::vector<float> mHighClick;
+    std::vector<float> mLowClick;
+    const std::vector<float> *mClick;
+    std::size_t mClickPosition;
 
     friend class AudioPlatform;
 };
@@ -20,18 +20,22 @@
 #include "AudioPlatform.hpp"
 #include <chrono>
 #include <iostream>
+#include <vector>
 
 namespace ableton
 {
 namespace linkaudio
 {
 
-AudioPlatform::AudioPlatform(Link &link)
-    : mEngine(link), mSampleTime(0.)
+AudioPlatform::AudioPlatform(Link &link,
+                             const bool headless,
+                             const double sampleRate,
+                             const unsigned long bufferSize)
+    : mEngine(link), mSampleTime(0.), pStream(nullptr), mNullBackendRunning(false)
 {
-    mEngine.setSampleRate(44100.);
-    mEngine.setBufferSize(512);
-    initialize();
+    mEngine.setSampleRate(sampleRate);
+    mEngine.setBufferSize(bufferSize);
+    initialize(headless);
     start();
 }
 
@@ -45,7 +49,7 @@ int AudioPlatform::audioCallback(const void * /*inputBuffer*/,
                                  void *outputBuffer,
                                  unsigned long inNumFrames,
                                  const PaStreamCallbackTimeInfo * /*timeInfo*/,
-                                 PaStreamCallbackFlags /*statusFlags*/,
+                                 PaStreamCallbackFlags statusFlags,
                                  void *userData)
 {
     using namespace std::chrono;
@@ -58,6 +62,11 @@ int AudioPlatform::audioCallback(const void * /*inputBuffer*/,
 
     platform.mSampleTime += inNumFrames;
 
+    if (statusFlags & paOutputUnderflow)
+    {
+        engine.countUnderflow();
+    }
+
     const auto bufferBeginAtOutput = hostTime + engine.mOutputLatency;
 
     engine.audioCallback(bufferBeginAtOutput, inNumFrames, buffer);
@@ -65,8 +74,37 @@ int AudioPlatform::audioCallback(const void * /*inputBuffer*/,
     return paContinue;
 }
 
-void AudioPlatform::initialize()
+void AudioPlatform::runNullBackend()
+{
+    using namespace std::chrono;
+
+    std::vector<float> buffer(mEngine.mBufferSize * 2);
+    const auto period = duration_cast<steady_clock::duration>(
+        duration<double>(mEngine.mBufferSize / mEngine.mSampleRate));
+    auto next = steady_clock::now();
+    while (mNullBackendRunning)
+    {
+        const auto hostTime = mHostTimeFilter.sampleTimeToHostTime(mSampleTime);
+        mSampleTime += mEngine.mBufferSize;
+        mEngine.audioCallback(hostTime + mEngine.mOutputLatency, mEngine.mBufferSize, buffer.data());
+        next += period;
+        // Count a buffer, which could not be played in time, and catch up
+        if (steady_clock::now() > next + period)
+        {
+            mEngine.countUnderflow();
+            next = steady_clock::now();
+        }
+        std::this_thread::sleep_until(next);
+    }
+}
+
+void AudioPlatform::initialize(const bool headless)
 {
+    if (headless)
+    {
+        return;
+    }
+
     PaError result = Pa_Initialize();
     if (result)
     {
@@ -78,8 +116,9 @@ void AudioPlatform::initialize()
     outputParameters.device = Pa_GetDefaultOutputDevice();
     if (outputParameters.device == paNoDevice)
     {
-        std::cerr << "Could not get Audio Device. " << std::endl;
-        std::terminate();
+        std::cerr << "Could not get Audio Device, running without audio output. " << std::endl;
+        Pa_Terminate();
+        return;
     }
 
     outputParameters.channelCount = 2;
@@ -87,8 +126,6 @@ void AudioPlatform::initialize()
     outputParameters.suggestedLatency =
         Pa_GetDeviceInfo(outputParameters.device)->defaultLowOutputLatency;
     outputParameters.hostApiSpecificStreamInfo = nullptr;
-    mEngine.mOutputLatency =
-        std::chrono::microseconds(llround(outputParameters.suggestedLatency * 1.0e6));
     result = Pa_OpenStream(&pStream, nullptr, &outputParameters, mEngine.mSampleRate,
                            mEngine.mBufferSize, paClipOff, &audioCallback, this);
 
@@ -103,26 +140,45 @@ void AudioPlatform::initialize()
         std::cerr << "No valid audio stream." << std::endl;
         std::terminate();
     }
+
+    // SunVox is already initialized with the requested rate, so a device running at
+    // another one would change pitch and timing. The latency is only known once the
+    // stream is open.
+    const auto info = Pa_GetStreamInfo(pStream);
+    if (llround(info->sampleRate) != llround(mEngine.mSampleRate))
+    {
+        std::cerr << "Audio Device runs at " << info->sampleRate << " Hz instead of "
+                  << mEngine.mSampleRate << " Hz, set SVSEQ_SAMPLE_RATE accordingly."
+                  << std::endl;
+        std::terminate();
+    }
+    mEngine.mOutputLatency = std::chrono::microseconds(llround(info->outputLatency * 1.0e6));
 }
 
 void AudioPlatform::uninitialize()
 {
+    if (pStream == nullptr)
+    {
+        return;
+    }
+
     PaError result = Pa_CloseStream(pStream);
     if (result)
     {
         std::cerr << "Could not close Audio Stream. " << result << std::endl;
     }
     Pa_Terminate();
-
-    if (!pStream)
-    {
-        std::cerr << "No valid audio stream." << std::endl;
-        std::terminate();
-    }
 }
 
 void AudioPlatform::start()
 {
+    if (pStream == nullptr)
+    {
+        mNullBackendRunning = true;
+        mNullBackend = std::thread(&AudioPlatform::runNullBackend, this);
+        return;
+    }
+
     PaError result = Pa_StartStream(pStream);
     if (result)
     {
@@ -134,6 +190,11 @@ void AudioPlatform::stop()
 {
     if (pStream == nullptr)
     {
+        mNullBackendRunning = false;
+        if (mNullBackend.joinable())
+        {
+            mNullBackend.join();
+        }
         return;
     }
 
@@ -22,7 +22,9 @@
 #include "AudioEngine.hpp"
 #include <ableton/link/HostTimeFilter.hpp>
 #include <ableton/platforms/Config.hpp>
+#include <atomic>
 #include <portaudio.h>
+#include <thread>
 
 namespace ableton
 {
@@ -32,7 +34,7 @@ namespace linkaudio
 class AudioPlatform
 {
 public:
-    AudioPlatform(Link &link);
+    AudioPlatform(Link &link, bool headless, double sampleRate, unsigned long bufferSize);
     ~AudioPlatform();
 
     AudioEngine mEngine;
@@ -45,7 +47,8 @@ private:
                              PaStreamCallbackFlags statusFlags,
                              void *userData);
 
-    void initialize();
+    void runNullBackend();
+    void initialize(bool headless);
     void uninitialize();
     void start();
     void stop();
@@ -53,6 +56,9 @@ private:
     link::HostTimeFilter<link::platform::Clock> mHostTimeFilter;
     double mSampleTime;
     PaStream *pStream;
+    // Without an audio device the engine is driven by a timer thread
+    std::thread mNullBackend;
+    std::atomic<bool> mNullBackendRunning;
 };
 
 } // namespace linkaudio
@@ -0,0 +1,68 @@
+#pragma once
+
+#include <array>
+#include <atomic>
+#include <cstddef>
+
+namespace ableton
+{
+namespace linkaudio
+{
+
+// Passes values from one writer thread to one reader thread in order. Neither side
+// ever blocks or allocates, the writer fails if the queue is full.
+template <typename T, std::size_t N>
+class CommandQueue
+{
+public:
+    CommandQueue()
+        : mHead(0), mTail(0)
+    {
+    }
+
+    // Writer side
+    bool push(const T &value)
+    {
+        const auto tail = mTail.load(std::memory_order_relaxed);
+        const auto next = (tail + 1) % N;
+        if (next == mHead.load(std::memory_order_acquire))
+        {
+            return false;
+        }
+        mItems[tail] = value;
+        mTail.store(next, std::memory_order_release);
+        return true;
+    }
+
+    // Writer side: the number of values, which can be pushed at least
+    std::size_t space() const
+    {
+        const auto tail = mTail.load(std::memory_order_relaxed);
+        const auto head = mHead.load(std::memory_order_acquire);
+        return N - 1 - (tail + N - head) % N;
+    }
+
+    // Reader side: the oldest value, or nullptr if the queue is empty
+    const T *front() const
+    {
+        const auto head = mHead.load(std::memory_order_relaxed);
+        if (head == mTail.load(std::memory_order_acquire))
+        {
+            return nullptr;
+        }
+        return &mItems[head];
+    }
+
+    void pop()
+    {
+        mHead.store((mHead.load(std::memory_order_relaxed) + 1) % N, std::memory_order_release);
+    }
+
+private:
+    std::array<T, N> mItems;
+    std::atomic<std::size_t> mHead;
+    std::atomic<std::size_t> mTail;
+};
+
+} // namespace linkaudio
+} // namespace ableton
@@ -0,0 +1,56 @@
+#pragma once
+
+#include <array>
+#include <atomic>
+#include <cstdint>
+
+namespace ableton
+{
+namespace linkaudio
+{
+
+// Hands the latest value from one writer thread to one reader thread. Neither side
+// ever blocks, and the reader never allocates or frees, it only swaps buffer indices.
+// Old values are destroyed by the writer when it reuses their buffer.
+template <typename T>
+class TripleBuffer
+{
+public:
+    explicit TripleBuffer(const T &value)
+        : mBuffers{{value, value, value}}, mMiddle(1), mBack(0), mFront(2)
+    {
+    }
+
+    // Writer side: fill the back buffer, then publish it
+    T &back()
+    {
+        return mBuffers[mBack];
+    }
+
+    void publish()
+    {
+        mBack = mMiddle.exchange(mBack | kDirty, std::memory_order_acq_rel) & kIndex;
+    }
+
+    // Reader side: the most recently published value
+    const T &front()
+    {
+        if (mMiddle.load(std::memory_order_relaxed) & kDirty)
+        {
+            mFront = mMiddle.exchange(mFront, std::memory_order_acq_rel) & kIndex;
+        }
+        return mBuffers[mFront];
+    }
+
+private:
+    static constexpr uint8_t kIndex = 0x03;
+    static constexpr uint8_t kDirty = 0x04;
+
+    std::array<T, 3> mBuffers;
+    std::atomic<uint8_t> mMiddle;
+    uint8_t mBack;
+    uint8_t mFront;
+};
+
+} // namespace linkaudio
+} // namespace ableton
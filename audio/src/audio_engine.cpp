@@ -18,7 +18,14 @@ struct Engine
     Link link;
     AudioPlatform audioPlatform;
 
-    Engine(double tempo, double quantum, double swing, std::chrono::microseconds latency) : link(tempo), audioPlatform(link)
+    Engine(double tempo,
+           double quantum,
+           double swing,
+           std::chrono::microseconds latency,
+           bool headless,
+           double sampleRate,
+           unsigned long bufferSize)
+        : link(tempo), audioPlatform(link, headless, sampleRate, bufferSize)
     {
         link.enable(true);
         audioPlatform.mEngine.setQuantum(quantum);
@@ -31,44 +38,63 @@ PYBIND11_MODULE(audio_engine, m)
 {
     using namespace pybind11;
 
-    m.def("init_sunvox", [](list instruments, int vol) {
+    m.def("init_sunvox", [](int modules, int vol, int sampleRate) {
         if (sv_load_dll())
         {
             exit(1);
         }
-        if (sv_init(NULL, 44100, 2, SV_INIT_FLAG_USER_AUDIO_CALLBACK | SV_INIT_FLAG_AUDIO_FLOAT32) < 0)
+        if (sv_init(NULL, sampleRate, 2, SV_INIT_FLAG_USER_AUDIO_CALLBACK | SV_INIT_FLAG_AUDIO_FLOAT32) < 0)
         {
             sv_unload_dll();
             exit(2);
         }
         sv_open_slot(0);
-        for (int i = 0; i < instruments.size(); i++)
+        // reserve the module numbers of all instruments, they are loaded on demand
+        for (int i = 0; i < modules; i++)
         {
-            auto const path = PyUnicode_AsUTF8(instruments[i].ptr());
-            if (path[0])
+            sv_load_module_from_memory(0, 0, 0, 0, 0, 0);
+        }
+        sv_volume(0, vol);
+    });
+
+    // modules are numbered like in sv_send_event, i.e. module number + 1
+    m.def("load_module", [](int module, std::string data) {
+        gil_scoped_release release;
+        sv_lock_slot(0);
+        sv_remove_module(0, module - 1);
+        sv_unlock_slot(0);
+        // all lower module numbers are in use, so the module should take the free
+        // number, otherwise it is removed and the number reserved again
+        auto const m = sv_load_module_from_memory(0, &data[0], data.size(), 0, 0, 0);
+        if (m != module - 1)
+        {
+            if (m > 0)
             {
-                auto const m = sv_load_module(0, path, 0, 0, 0);
-                if (m < 1)
-                {
-                    sv_close_slot(0);
-                    sv_deinit();
-                    sv_unload_dll();
-                    exit(3);
-                }
                 sv_lock_slot(0);
-                sv_connect_module(0, m, 0);
+                sv_remove_module(0, m);
                 sv_unlock_slot(0);
             }
-            else
-            {
-                sv_load_module_from_memory(0, 0, 0, 0, 0, 0);
-            }
+            sv_load_module_from_memory(0, 0, 0, 0, 0, 0);
+            return false;
         }
-        sv_volume(0, vol);
+        sv_lock_slot(0);
+        sv_connect_module(0, m, 0);
+        sv_unlock_slot(0);
+        return true;
+    });
+
+    m.def("unload_module", [](int module) {
+        gil_scoped_release release;
+        sv_lock_slot(0);
+        sv_remove_module(0, module - 1);
+        sv_unlock_slot(0);
+        sv_load_module_from_memory(0, 0, 0, 0, 0, 0);
     });
 
     class_<Engine>(m, "Engine")
-        .def(init<double, double, double, std::chrono::microseconds>())
+        .def(init<double, double, double, std::chrono::microseconds, bool, double, unsigned long>(),
+             arg("tempo"), arg("quantum"), arg("swing"), arg("latency"), arg("headless") = false,
+             arg("sample_rate") = 44100., arg("buffer_size") = 512)
         .def("start", [](Engine &engine, bool metronome) {
             engine.audioPlatform.mEngine.startPlaying(metronome);
         })
@@ -95,33 +121,79 @@ PYBIND11_MODULE(audio_engine, m)
             auto beat = sessionState.beatAtTime(time, quantum);
             return make_tuple(sessionState.tempo(), beat);
         })
-        .def("setEvents", [](Engine &engine, std::vector<std::tuple<int, int, int, int, int, int>> &events) {
-            engine.audioPlatform.mEngine.setEvents(events);
+        .def("setPattern", [](Engine &engine, std::size_t track, std::size_t index, std::size_t length, AudioEngine::Pattern &pattern) {
+            engine.audioPlatform.mEngine.setPattern(track, index, length, pattern);
+        })
+        .def("setSteps", [](Engine &engine, std::size_t track, std::size_t index, AudioEngine::Pattern &steps) {
+            engine.audioPlatform.mEngine.setSteps(track, index, steps);
+        })
+        .def("setSequence", [](Engine &engine, std::size_t track, std::vector<int> &sequence) {
+            engine.audioPlatform.mEngine.setSequence(track, sequence);
+        })
+        .def("setResolution", [](Engine &engine, std::size_t track, int resolution) {
+            engine.audioPlatform.mEngine.setResolution(track, resolution);
+        })
+        .def("getSampleRate", [](Engine &engine) {
+            return engine.audioPlatform.mEngine.sampleRate();
+        })
+        .def("getBufferSize", [](Engine &engine) {
+            return engine.audioPlatform.mEngine.bufferSize();
+        })
+        .def("getOutputLatency", [](Engine &engine) {
+            return engine.audioPlatform.mEngine.outputLatency();
+        })
+        .def("render", [](Engine &engine, double tempo, double beats) {
+            std::string pcm;
+            {
+                gil_scoped_release release;
+                pcm = engine.audioPlatform.mEngine.render(tempo, beats);
+            }
+            return bytes(pcm);
+        })
+        .def("getRenderStats", [](Engine &engine) {
+            auto const stats = engine.audioPlatform.mEngine.renderStats();
+            return make_tuple(stats.buffers, stats.events, stats.audio);
+        })
+        .def("getStats", [](Engine &engine) {
+            auto const stats = engine.audioPlatform.mEngine.stats();
+            dict d;
+            d["callbacks"] = stats.callbacks;
+            d["underflows"] = stats.underflows;
+            d["callback"] = stats.callback;
+            d["max_callback"] = stats.maxCallback;
+            d["events"] = stats.events;
+            d["audio"] = stats.audio;
+            d["histogram"] = std::vector<std::size_t>(stats.histogram.begin(), stats.histogram.end());
+            return d;
         })
         .def("sendNotes", [](Engine &engine, int track_num, int note0, int note1, int note2, int note3, int vel, int module) {
-            sv_lock_slot(0);
-            sv_send_event(0, track_num * 4, note0, vel, module, 0, 0);
-            sv_send_event(0, track_num * 4 + 1, note1, vel, module, 0, 0);
-            sv_send_event(0, track_num * 4 + 2, note2, vel, module, 0, 0);
-            sv_send_event(0, track_num * 4 + 3, note3, vel, module, 0, 0);
-            sv_unlock_slot(0);
+            return engine.audioPlatform.mEngine.sendEvents({
+                AudioEngine::Event{track_num * 4, note0, vel, module, 0, 0},
+                AudioEngine::Event{track_num * 4 + 1, note1, vel, module, 0, 0},
+                AudioEngine::Event{track_num * 4 + 2, note2, vel, module, 0, 0},
+                AudioEngine::Event{track_num * 4 + 3, note3, vel, module, 0, 0},
+            });
         })
         .def("sendNoteOff", [](Engine &engine, int track_num, int module) {
-            sv_lock_slot(0);
-            sv_send_event(0, track_num * 4, 128, 0, module, 0, 0);
-            sv_send_event(0, track_num * 4 + 1, 128, 0, module, 0, 0);
-            sv_send_event(0, track_num * 4 + 2, 128, 0, module, 0, 0);
-            sv_send_event(0, track_num * 4 + 3, 128, 0, module, 0, 0);
-            sv_unlock_slot(0);
+            return engine.audioPlatform.mEngine.sendEvents({
+                AudioEngine::Event{track_num * 4, 128, 0, module, 0, 0},
+                AudioEngine::Event{track_num * 4 + 1, 128, 0, module, 0, 0},
+                AudioEngine::Event{track_num * 4 + 2, 128, 0, module, 0, 0},
+                AudioEngine::Event{track_num * 4 + 3, 128, 0, module, 0, 0},
+            });
         })
         .def("setVolume", [](Engine &engine, int module, int value) {
-            sv_send_event(0, 0, 0, 0, module, 0x0100, value);
+            return engine.audioPlatform.mEngine.sendEvents({
+                AudioEngine::Event{0, 0, 0, module, 0x0100, value},
+            });
         })
         .def("setCtls", [](Engine &engine, int module, const std::tuple<int, int, int, int> &ctls) {
-            sv_send_event(0, 0, 0, 0, module, 0x0600, std::get<0>(ctls));
-            sv_send_event(0, 0, 0, 0, module, 0x0700, std::get<1>(ctls));
-            sv_send_event(0, 0, 0, 0, module, 0x0800, std::get<2>(ctls));
-            sv_send_event(0, 0, 0, 0, module, 0x0900, std::get<3>(ctls));
+            return engine.audioPlatform.mEngine.sendEvents({
+                AudioEngine::Event{0, 0, 0, module, 0x0600, std::get<0>(ctls)},
+                AudioEngine::Event{0, 0, 0, module, 0x0700, std::get<1>(ctls)},
+                AudioEngine::Event{0, 0, 0, module, 0x0800, std::get<2>(ctls)},
+                AudioEngine::Event{0, 0, 0, module, 0x0900, std::get<3>(ctls)},
+            });
         })
         .def("getCtls", [](Engine &engine) {
             list vll;
@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+from statistics import median
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+import pygame
+import pygame.midi
+from mopyx import action
+from mopyx.rendering import RendererFunction, RenderMode
+
+from engine import _compile_step, engine
+from launchpad import Launchpad
+from project import project
+from ui.mixer import Mixer
+from ui.pattern import Pattern
+from ui.session import Preset, Session
+from ui.tempo import Tempo
+
+
+def populate() -> None:
+    """
+    Fills all notes of all patterns with tones, chords, controls and triggers.
+    """
+    r = random.Random(0)
+
+    @action
+    def fill() -> None:
+        for t in project.tracks:
+            t.sequence = list(range(8))
+            for p in t.patterns:
+                for n in p.notes:
+                    n.tone = r.randint(1, 120)
+                    n.chord = (r.choice((3, 4)), 7, r.choice((None, 10)))
+                    n.control = [r.random() for _ in range(5)]
+                    n.trigger = r.randint(0, 2)
+
+    fill()
+
+
+def report(name: str, times: List[float]) -> Dict[str, Any]:
+    result = {'name': name, 'min': min(times), 'median': median(times)}
+    print(f'{name:<32}{result["min"] * 1e6:>12.1f}{result["median"] * 1e6:>12.1f}')
+    return result
+
+
+def count(name: str, n: int) -> Dict[str, Any]:
+    print(f'{name:<32}{n:>12}')
+    return {'name': name, 'count': n}
+
+
+def measure(name: str, f: Callable[[], Any], number: int, repeat: int = 5) -> Dict[str, Any]:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            f()
+        times.append((perf_counter() - start) / number)
+    return report(name, times)
+
+
+def bench_engine() -> List[Dict[str, Any]]:
+    notes = [(i, tick, t.instrument * 2 + (3 if t.percussion else 2), n)
+             for i, t in enumerate(project.tracks)
+             for p in t.patterns
+             for tick, n in enumerate(p.notes)]
+
+    def compile_all() -> None:
+        for i, tick, instrument, n in notes:
+            _compile_step(i, tick, instrument, engine.defaultCtls,
+                          n.tone, n.chord, n.control, n.trigger)
+
+    note = project.tracks[0].patterns[0].notes[0]
+
+    @action
+    def edit() -> None:
+        note.tone = note.tone % 120 + 1
+
+    return [
+        measure('engine.compile (all patterns)', compile_all, 5),
+        measure('engine.compile (one edit)', edit, 100),
+    ]
+
+
+def bench_project() -> List[Dict[str, Any]]:
+    d = json.loads(json.dumps(project.dict))
+    note = project.tracks[0].patterns[0].notes[0]
+
+    @action
+    def edit() -> None:
+        note.trigger = (note.trigger + 1) % 3
+
+    def dump() -> None:
+        edit()
+        json.dumps(project.dict)
+
+    def load() -> None:
+        project.from_dict(json.loads(json.dumps(d)))
+
+    def dump_binary() -> None:
+        edit()
+        project.to_bytes()
+
+    b = project.to_bytes()
+
+    def load_binary() -> None:
+        project.from_bytes(b)
+
+    results = [
+        measure('project.dump', dump, 20),
+        measure('project.load', load, 5),
+        measure('project.dump (binary)', dump_binary, 20),
+        measure('project.load (binary)', load_binary, 5),
+    ]
+    load()
+    return results
+
+
+def bench_launchpad(pad: Launchpad) -> List[Dict[str, Any]]:
+    frames = [[0x033 if (i + j) % 2 else 0x130 for i in range(80)]
+              for j in range(2)]
+    frame = 0
+
+    def refresh() -> None:
+        nonlocal frame
+        frame ^= 1
+        for i, v in enumerate(frames[frame]):
+            pad.set(i, v)
+        pad.refresh()
+
+    results = [
+        measure('launchpad.refresh (full diff)', refresh, 100),
+        measure('launchpad.refresh (no change)', pad.refresh, 100),
+    ]
+    pad.calls()
+    for _ in pad.poll():
+        pass
+    refresh()
+    reads, writes = pad.calls()
+    return results + [
+        count('launchpad MIDI reads per frame', reads),
+        count('launchpad MIDI writes per frame', writes),
+    ]
+
+
+def bench_views(pad: Launchpad) -> List[Dict[str, Any]]:
+    def attach(padget: Any) -> RendererFunction:
+        # a root renderer, so the view can be detached from the model again
+        renderer = RendererFunction(
+            None, padget.renderUi, RenderMode.RENDER, False)
+        renderer.render()
+        return renderer
+
+    @action
+    def step() -> None:
+        # like Engine.update, which sets changed values only
+        if engine.uiState.playing != 1:
+            engine.uiState.playing = 1
+        engine.uiState.phase = (engine.uiState.phase + 1) % 8
+        engine.uiState.moveStep(0, engine.uiState.phase * 4)
+
+    results = []
+    for name, view in (('session', lambda: Session(pad)),
+                       ('mixer', lambda: Mixer(pad)),
+                       ('tempo', lambda: Tempo(pad)),
+                       ('preset', lambda: Preset(pad, 0)),
+                       ('pattern', lambda: Pattern(pad, 0, 0))):
+        results.append(measure(f'renderUi {name} (initial)',
+                               lambda: attach(view()).unregister(), 10))
+        renderer = attach(view())
+        # full redraw of the Launchpad when switching to the view
+        start = perf_counter()
+        messages = pad.refresh()
+        results.append(report(f'launchpad.refresh (enter {name})',
+                              [perf_counter() - start]))
+        results.append(count(f'launchpad messages (enter {name})', messages))
+        results.append(measure(f'renderUi {name} (playhead)', step, 100))
+        renderer.unregister()
+    return results
+
+
+def bench_audio() -> List[Dict[str, Any]]:
+    for i in range(8):
+        engine.audioEngine.setSequence(i, list(range(8)))
+    start = perf_counter()
+    engine.audioEngine.render(project.tempo, 8 * project.quantum)
+    elapsed = perf_counter() - start
+    buffers, events, audio = engine.audioEngine.getRenderStats()
+    return [
+        report('createSunvoxEvents per buffer', [events / buffers]),
+        report('sv_audio_callback per buffer', [audio / buffers]),
+        report('render per buffer', [elapsed / buffers]),
+    ]
+
+
+parser = argparse.ArgumentParser(
+    description='Time the sequencer hot paths with a fully populated project.')
+parser.add_argument('--json', metavar='FILE',
+                    help='append the results of this commit to FILE as a JSON line')
+args = parser.parse_args()
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame.init()
+pygame.midi.init()
+pad = Launchpad(pygame.Surface((800, 600)), b'(none)')
+
+populate()
+
+print(f'{"":<32}{"min (us)":>12}{"median (us)":>12}')
+results = bench_engine() + bench_project() + \
+    bench_launchpad(pad) + bench_views(pad) + bench_audio()
+
+if args.json:
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                            capture_output=True, text=True).stdout.strip()
+    with open(args.json, 'a') as f:
+        json.dump({'commit': commit, 'python': sys.version.split()[0],
+                   'results': results}, f)
+        f.write('\n')
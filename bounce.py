@@ -0,0 +1,27 @@
+import argparse
+import os
+
+from engine import engine
+from project import project
+
+parser = argparse.ArgumentParser(
+    description='Render the session or a single pattern into a WAV file.')
+parser.add_argument('output', help='WAV file to write')
+parser.add_argument('--project', default='project.svseq',
+                    help='project file (default: %(default)s)')
+parser.add_argument('--pattern', type=int, nargs=2, metavar=('TRACK', 'PATTERN'),
+                    help='render a single pattern (1 - 8) instead of the session')
+parser.add_argument('--stems', action='store_true',
+                    help='render each track into its own file')
+args = parser.parse_args()
+
+project.load(args.project)
+engine.initInstruments()
+
+pattern = (args.pattern[0] - 1, args.pattern[1] - 1) if args.pattern else None
+if args.stems:
+    base, ext = os.path.splitext(args.output)
+    for i in range(8):
+        engine.bounce(f'{base}-{i + 1}{ext}', pattern, [i])
+else:
+    engine.bounce(args.output, pattern)
@@ -1,33 +1,73 @@
 import os
+import sys
+import wave
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from itertools import zip_longest
-from math import floor
-from typing import Generator, List, Optional, Tuple
+from math import floor, inf, lcm
+from typing import (Dict, Generator, Hashable, Iterable, List, Optional,
+                    Sequence, Tuple)
 
 from mopyx import action, render
 
 import audio_engine
 from model import model
-from project import Note, project
+from project import project
+
+
+# pattern index of the events sent for tracks without an active pattern
+IDLE = 8
+# run without audio device and display
+HEADLESS = 'SVSEQ_HEADLESS' in os.environ
+# requested from the audio device, which has to support the sample rate
+SAMPLE_RATE = int(os.environ.get('SVSEQ_SAMPLE_RATE', 44100))
+BUFFER_SIZE = int(os.environ.get('SVSEQ_BUFFER_SIZE', 512))
+# number of loaded instruments, before unused ones are unloaded
+MAX_INSTRUMENTS = 16
+# (track_num, note + trigger * 256, vel, module, ctl, ctl_val)
+Event = Tuple[int, int, int, int, int, int]
 
 
 class Engine:
-    def __init__(self) -> None:
+    def __init__(self, paths: List[str]) -> None:
         self.uiState = UiState()
         self.playing = False
         self.recording: Optional[Tuple[int, int]] = None
         self.session = False
-        self.tick = 0
         self.pattern: List[Optional[int]] = [None] * 8
+        # sequences played by the audio engine, without IDLE
+        self.__sequences: List[List[int]] = [[] for _ in range(8)]
+        # length and compiled steps of the patterns sent to the audio engine, by
+        # track and pattern, with the key each step was compiled for
+        self.__compiled: Dict[Tuple[int, int],
+                              Tuple[int, Dict[int, Tuple[Hashable, List[Event]]]]] = {}
+        # tempo and beat of the last update
+        self.__state = (project.tempo, 0.0)
         self.audioEngine = audio_engine.Engine(
-            project.tempo, project.quantum, project.swing / 48, timedelta(milliseconds=project.latency * 7))
-        self.defaultCtls = self.audioEngine.getCtls()
+            project.tempo, project.quantum, project.swing / 48, timedelta(milliseconds=project.latency * 7),
+            HEADLESS, SAMPLE_RATE, BUFFER_SIZE)
+        self.instruments = Instruments(paths, self.audioEngine)
         self.__tempo_changed()
         self.__latency_changed()
         self.__quantum_changed()
         self.__swing_changed()
+        for i in range(8):
+            self.__resolution_changed(i)
+            self.__idle_changed(i)
+            for p in range(8):
+                self.__pattern_changed(i, p)
+            self.__sequence_changed(i)
 
-    def initVolume(self) -> None:
+    @property
+    def defaultCtls(self) -> Sequence[Sequence[int]]:
+        return self.instruments.ctls
+
+    def initInstruments(self) -> None:
+        """
+        Loads the instruments of all tracks and sets their volume.
+        """
+        self.loadInstruments()
         for track in project.tracks:
             if track.muted:
                 self.audioEngine.setVolume(
@@ -36,13 +76,19 @@ class Engine:
                 self.audioEngine.setVolume(
                     track.instrument * 2 + (3 if track.percussion else 2), round(track.volume * 0x4000))
 
+    def loadInstruments(self) -> None:
+        self.instruments.load([track.instrument * 2 + (3 if track.percussion else 2)
+                               for track in project.tracks])
+
     def startOrStopPattern(self, track: int, pattern: int, record: bool) -> None:
         if not self.playing:
-            self.tick = 0
+            self.__load(track, pattern)
+            self.session = False
             for i in range(8):
                 self.pattern[i] = pattern if i == track else None
-            self.__update_events()
-            self.session = False
+                self.__sequences[i] = [pattern] if i == track else []
+                self.audioEngine.setSequence(
+                    i, [pattern] if i == track else [IDLE])
             self.playing = True
             if record:
                 self.recording = (track, pattern)
@@ -55,12 +101,12 @@ class Engine:
 
     def startOrStopSession(self) -> None:
         if not self.playing:
-            self.tick = 0
+            self.session = True
             for i in range(8):
                 s = project.tracks[i].sequence
                 self.pattern[i] = s[0] if s else None
-            self.__update_events()
-            self.session = True
+                self.__sequences[i] = list(s)
+                self.audioEngine.setSequence(i, list(s) or [IDLE])
             self.playing = True
             self.audioEngine.start(False)
         else:
@@ -68,25 +114,60 @@ class Engine:
             self.audioEngine.stop()
             self.__reset_ctls()
 
+    def bounce(self, name: str, pattern: Optional[Tuple[int, int]] = None, tracks: Iterable[int] = range(8)) -> None:
+        """
+        Renders the session, or a single pattern, of the given tracks offline into a WAV file.
+        """
+        if self.playing:
+            raise RuntimeError('Cannot bounce while playing')
+        tracks = set(tracks)
+        if pattern:
+            self.__load(*pattern)
+        # length until all sequences loop, in 1/16 beats
+        loop = 0
+        for i in range(8):
+            track = project.tracks[i]
+            s = list(track.sequence)
+            if i not in tracks:
+                s = []
+            elif pattern:
+                s = [pattern[1]] if i == pattern[0] else []
+            if s:
+                loop = lcm(loop or 1, sum(track.patterns[p].steps for p in s) *
+                           (16 // track.resolution))
+            self.audioEngine.setSequence(i, s or [IDLE])
+        pcm = self.audioEngine.render(
+            project.tempo, loop / 16 if loop else project.quantum)
+        with wave.open(name, 'wb') as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(round(self.audioEngine.getSampleRate()))
+            f.writeframes(pcm)
+
+    @action
+    def __load(self, track: int, pattern: int) -> None:
+        # a deferred pattern out of the sequence is only compiled once loaded, by
+        # the render at the end of this action
+        project.tracks[track].patterns[pattern].load()
+
     @action
     def update(self) -> None:
         if not self.playing and self.uiState.playing:
             self.uiState.playing = 0
 
         tempo, beat = self.audioEngine.getState()
+        self.__state = tempo, beat
         if tempo != self.engineTempo:
             project.tempo = max(min(round(tempo), 240), 40)
 
         if self.playing:
-            tick = (floor(beat * 4) + 1) if beat >= 0 else 0
-            if self.tick == 0 and tick == 1 or 0 < self.tick < tick:
-                self.tick = tick
-                if tick % (project.quantum * 4) == 0 and self.session:
-                    for i in range(8):
-                        s = project.tracks[i].sequence
-                        self.pattern[i] = s[(tick // (project.quantum * 4)) %
-                                            len(s)] if s else None
-                self.__update_events()
+            for i, track in enumerate(project.tracks):
+                r = track.resolution
+                self.pattern[i], _ = self.__position(
+                    i, floor(beat * r) if beat >= 0 else 0)
+                # the step at the beginning of the beat
+                _, step = self.__position(i, floor(beat) * r if beat >= 0 else 0)
+                self.uiState.moveStep(i, step)
 
             for i, p in enumerate(self.pattern):
                 if p != self.uiState.pattern[i]:
@@ -100,60 +181,103 @@ class Engine:
             if phase != self.uiState.phase:
                 self.uiState.phase = phase
 
-    def __update_events(self) -> None:
+    def step(self, track: int) -> int:
         """
-        track_num - track number within the pattern;
-        note: 0 - nothing; 1..127 - note num; 128 - note off; 129, 130... - see NOTECMD_xxx defines;
-        vel: velocity 1..129; 0 - default;
-        module: 0 (empty) or module number + 1 (1..65535);
-        ctl: 0xCCEE. CC - number of a controller (1..255). EE - effect;
-        ctl_val: value of controller or effect.
+        Returns the step of the pattern played by the track, which follows the
+        current step. The beat is read from the audio engine, as the last update
+        may be more than one step ago at fine resolutions.
         """
-        events: List[Tuple[int, int, int, int, int, int]] = []
+        _, beat = self.audioEngine.getState()
+        r = project.tracks[track].resolution
+        _, step = self.__position(track, floor(beat * r) + 1 if beat >= 0 else 0)
+        return step
 
-        for i in range(8):
-            track = project.tracks[i]
-            p = self.pattern[i]
-            tick = self.tick % (project.quantum * 4)
-            note: Optional[Note]
-            if p is not None:
-                note = track.patterns[p].notes[tick]
-            elif p is None and tick == 0:
-                note = Note()
-            else:
-                note = None
-
-            if note:
-                instrument = track.instrument * 2 + \
-                    (3 if track.percussion else 2)
-                ctls = []
-                for j in range(4):
-                    c = note.control[j + 1]
-                    ctls.append(round(c * 0x8000)
-                                if c is not None else self.defaultCtls[instrument - 2][j] if tick == 0 else None)
-                tone = note.tone
-
-                if tone > 0:
-                    tones = [tone]
-                    for c in note.chord:
-                        tones.append((tone + c) if c is not None else 128)
-                    ctl0 = note.control[0]
-                    vel = round(ctl0 * 128) + 1 if ctl0 is not None else 0
-                    for j in range(4):
-                        ctl = ctls[j]
-                        events.append(
-                            (i * 4 + j, tones[j] + note.trigger * 256, vel, instrument, ((j + 6) << 8) if ctl is not None else 0, ctl if ctl is not None else 0))
-
-                else:
-                    ctl0 = note.control[0]
-                    vel = round(ctl0 * 128) + 1 if ctl0 is not None else 0
-                    for j in range(4):
-                        ctl = ctls[j]
-                        if tone or ctl is not None or vel:
-                            events.append(
-                                (i * 4 + j, 128 if tone or tick == 0 else 0, vel, instrument, ((j + 6) << 8) if ctl is not None else 0, ctl if ctl is not None else 0))
-
-        self.audioEngine.setEvents(events)
+    def __position(self, i: int, tick: int) -> Tuple[Optional[int], int]:
+        # the pattern and its step played at a tick, counted in steps of the track
+        # since the start
+        patterns = project.tracks[i].patterns
+        lengths = [(p, patterns[p].steps) for p in self.__sequences[i]]
+        loop = sum(n for _, n in lengths)
+        if not loop:
+            return None, 0
+        tick %= loop
+        for p, n in lengths:
+            if tick < n:
+                return p, tick
+            tick -= n
+        return None, 0
+
+    def timeout(self) -> float:
+        """
+        Returns the seconds until the next 1/16 beat begins, if playing. The
+        playhead of the views moves per beat, and patterns change at least half a
+        beat apart, so finer resolutions need no earlier update.
+        """
+        if not self.playing:
+            return inf
+        tempo, beat = self.__state
+        return (floor(beat * 4) + 1 - beat * 4) / 4 * 60 / tempo
+
+    @render
+    def __pattern_changed(self, i: int, p: int) -> None:
+        track = project.tracks[i]
+        pattern = track.patterns[p]
+        if pattern.deferred and p not in track.sequence:
+            # compiled once the pattern is sequenced or loaded
+            pattern.observe()
+            self.__compiled.pop((i, p), None)
+            self.audioEngine.setPattern(i, p, pattern.steps, [])
+            return
+        instrument = track.instrument * 2 + (3 if track.percussion else 2)
+        defaultCtls = self.defaultCtls
+        # only the first and the non-empty steps have events, empty steps are
+        # neither read nor observed
+        notes = pattern.notes
+        ticks = pattern.non_empty()
+        if not ticks or ticks[0] != 0:
+            ticks.insert(0, 0)
+        # steps are only compiled again if the note, its instrument or the default
+        # controls (which only the first step uses) changed
+        length, compiled = self.__compiled.get((i, p), (0, {}))
+        steps: Dict[int, Tuple[Hashable, List[Event]]] = {}
+        changed: List[Tuple[int, List[Event]]] = []
+        for tick in ticks:
+            note = notes[tick]
+            key = (note.revision, instrument,
+                   defaultCtls[instrument - 2] if tick == 0 else None)
+            step = compiled.get(tick)
+            if step is None or step[0] != key:
+                step = key, _compile_step(i, tick, instrument, defaultCtls, note.tone,
+                                          note.chord, note.control, note.trigger)
+                changed.append((tick, step[1]))
+            steps[tick] = step
+        self.__compiled[(i, p)] = pattern.steps, steps
+        if length != pattern.steps:
+            self.audioEngine.setPattern(i, p, pattern.steps, [(tick, events)
+                                                              for tick, (_, events) in steps.items()])
+            return
+        changed += [(tick, []) for tick in compiled if tick not in steps]
+        if changed:
+            self.audioEngine.setSteps(i, p, changed)
+
+    @render
+    def __idle_changed(self, i: int) -> None:
+        track = project.tracks[i]
+        instrument = track.instrument * 2 + (3 if track.percussion else 2)
+        # lasts one quantum
+        self.audioEngine.setPattern(i, IDLE, project.quantum * track.resolution, [(0, _compile_step(
+            i, 0, instrument, self.defaultCtls, 0, (None, None, None), [None] * 5, 0))])
+
+    @render
+    def __resolution_changed(self, i: int) -> None:
+        self.audioEngine.setResolution(i, project.tracks[i].resolution)
+
+    @render
+    def __sequence_changed(self, i: int) -> None:
+        s = list(project.tracks[i].sequence)
+        if self.playing and self.session:
+            self.__sequences[i] = s
+            self.audioEngine.setSequence(i, s or [IDLE])
 
     @render
     def __tempo_changed(self) -> None:
@@ -179,6 +303,46 @@ class Engine:
             self.audioEngine.setCtls(module, self.defaultCtls[module - 2])
 
 
+def _compile_step(i: int, tick: int, instrument: int, defaultCtls: Sequence[Sequence[int]], tone: int,
+                  chord: Tuple[Optional[int], Optional[int], Optional[int]], control: Sequence[Optional[float]],
+                  trigger: int) -> List[Event]:
+    """
+    track_num - track number within the pattern;
+    note: 0 - nothing; 1..127 - note num; 128 - note off; 129, 130... - see NOTECMD_xxx defines;
+    vel: velocity 1..129; 0 - default;
+    module: 0 (empty) or module number + 1 (1..65535);
+    ctl: 0xCCEE. CC - number of a controller (1..255). EE - effect;
+    ctl_val: value of controller or effect.
+    """
+    events: List[Event] = []
+
+    ctls = []
+    for j in range(4):
+        c = control[j + 1]
+        ctls.append(round(c * 0x8000)
+                    if c is not None else defaultCtls[instrument - 2][j] if tick == 0 else None)
+
+    ctl0 = control[0]
+    vel = round(ctl0 * 128) + 1 if ctl0 is not None else 0
+    if tone > 0:
+        tones = [tone]
+        for c in chord:
+            tones.append((tone + c) if c is not None else 128)
+        for j in range(4):
+            ctl = ctls[j]
+            events.append(
+                (i * 4 + j, tones[j] + trigger * 256, vel, instrument, ((j + 6) << 8) if ctl is not None else 0, ctl if ctl is not None else 0))
+
+    else:
+        for j in range(4):
+            ctl = ctls[j]
+            if tone or ctl is not None or vel:
+                events.append(
+                    (i * 4 + j, 128 if tone or tick == 0 else 0, vel, instrument, ((j + 6) << 8) if ctl is not None else 0, ctl if ctl is not None else 0))
+
+    return events
+
+
 @model
 class UiState:
     def __init__(self) -> None:
@@ -188,6 +352,30 @@ class UiState:
         self.phase = 0
         # None | 0 - 7 per track
         self.pattern: List[Optional[int]] = [None] * 8
+        # step of the pattern at the beginning of the current beat, per track, an
+        # array is not tracked by mopyx
+        self.__steps = array('H', [0] * 8)
+
+    def playhead(self, track: int, step: int) -> bool:
+        """
+        Returns whether the step is the one of the track at the beginning of the
+        current beat. Only changes of this step being the playhead are tracked.
+        """
+        self._mopyx_register_active_renderers(_step_key(track, step))
+        return self.__steps[track] == step
+
+    @action
+    def moveStep(self, track: int, step: int) -> None:
+        old = self.__steps[track]
+        if step != old:
+            self.__steps[track] = step
+            self._mopyx_register_refresh(_step_key(track, old))
+            self._mopyx_register_refresh(_step_key(track, step))
+
+
+def _step_key(track: int, step: int) -> str:
+    # key of the playhead being at a step, for tracking by mopyx
+    return f'step{track}.{step}'
 
 
 def modules(subfolder: str) -> Generator[str, None, None]:
@@ -196,11 +384,70 @@ def modules(subfolder: str) -> Generator[str, None, None]:
             yield os.path.abspath(entry.path)
 
 
-instruments = []
+@model
+class Instruments:
+    """
+    Loads instruments on demand into their reserved modules. Loaded instruments,
+    which are not assigned to a track, are unloaded least recently used first,
+    when more than MAX_INSTRUMENTS are loaded.
+    """
+
+    def __init__(self, paths: List[str], audioEngine: audio_engine.Engine) -> None:
+        self.__paths = paths
+        self.__audioEngine = audioEngine
+        # loaded modules, in order of their last use
+        self.__loaded: Dict[int, None] = {}
+        # default controls of all modules
+        self.ctls = self.__read_ctls()
+
+    @action
+    def load(self, modules: List[int]) -> None:
+        """
+        Loads the instruments of the given modules, which are numbered like the
+        instruments of the audio engine.
+        """
+        missing = [m for m in modules if m not in self.__loaded]
+        for m in modules:
+            self.__loaded.pop(m, None)
+            self.__loaded[m] = None
+        if not missing:
+            return
+        paths = [self.__paths[m - 2] if m - 2 < len(self.__paths) else ''
+                 for m in missing]
+        for m, path, data in zip(missing, paths, self.__read(paths)):
+            if data and not audio_engine.load_module(m, data):
+                print(f'Cannot load instrument "{path}"', file=sys.stderr)
+        for m in list(self.__loaded)[:max(len(self.__loaded) - MAX_INSTRUMENTS, 0)]:
+            if m not in modules:
+                audio_engine.unload_module(m)
+                del self.__loaded[m]
+        self.ctls = self.__read_ctls()
+
+    def __read(self, paths: List[str]) -> List[bytes]:
+        # the files are read in parallel, SunVox only loads them one by one
+        def read(path: str) -> bytes:
+            if not path:
+                return b''
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            except OSError as e:
+                print(f'Cannot read instrument "{path}": {e}',
+                      file=sys.stderr)
+                return b''
+
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(read, paths))
+
+    def __read_ctls(self) -> Tuple[Tuple[int, ...], ...]:
+        return tuple(tuple(c) for c in self.__audioEngine.getCtls())
+
+
+paths = []
 for ms in zip_longest(modules('melody'), modules('percussion')):
     for m in ms:
-        instruments.append(m or '')
+        paths.append(m or '')
 
-audio_engine.init_sunvox(instruments, 128)
+audio_engine.init_sunvox(len(paths), 128, SAMPLE_RATE)
 
-engine = Engine()
+engine = Engine(paths)
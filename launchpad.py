@@ -1,12 +1,17 @@
 import math
+import queue
 import sys
+import threading
+import time
 from typing import Generator, List, Optional, Tuple, cast
 
 import pygame.draw
 import pygame.event
 import pygame.font
 import pygame.midi
+import pygame.time
 from pygame import locals
+from pygame.rect import Rect
 from pygame.surface import Surface
 
 BUTTON_SCENE_1 = 64
@@ -19,10 +24,24 @@ BUTTON_USER_1 = 77
 BUTTON_USER_2 = 78
 BUTTON_MIXER = 79
 
-# fast mode seems to be broken
-FAST_MODE = False
-BLINK_PERIOD = 10
+# LED values: 0x04 (copy to both buffers) or 0x08 (clear other buffer, i.e. blink)
+# combined with the red (0x03) and green (0x30) brightness
+
+# number of changed LEDs, from which the whole frame is sent at once
+FRAME_CHANGES = 40
+# milliseconds between blink phases of the mirror
+BLINK_PERIOD = 167
+# seconds between polls of the MIDI input, PortMidi has no blocking read
+READ_INTERVAL = 0.005
+# maximum number of MIDI events read at once
+READ_BATCH = 64
 LABELS = ["U", "D", "L", "R", "S", "U1", "U2", "M"]
+# posted by the MIDI reader, to wake up the wait for events of the mirror
+_MIDI_EVENT = locals.USEREVENT
+
+
+def _steady(v: int) -> int:
+    return 0 if v & 0x08 else v & 0x33
 
 
 class NoopMidi:
@@ -35,27 +54,42 @@ class NoopMidi:
     def write_short(self, status: int, data1=0, data2=0):
         pass
 
+    def write(self, data: list):
+        pass
+
     def close(self):
         pass
 
 
 class Launchpad:
-    def __init__(self, screen: Surface, id: bytes = b'Launchpad'):
+    def __init__(self, screen: Optional[Surface], id: bytes = b'Launchpad'):
+        # without screen, the launchpad is not mirrored on the display
         self.__screen = screen
-        w = screen.get_width()
-        h = screen.get_height()
-        d = math.floor(min(w, h) / 10)
-        di = d - math.floor(d / 10)
-        x = math.floor((w - 10 * d) / 2)
-        y = math.floor((h - 10 * d) / 2)
-        self.__dims = x, y, d, di
-        font = pygame.font.SysFont("", d // 2)
         self.__labels: List[Surface] = []
-        for label in LABELS:
-            self.__labels.append(font.render(label, True, (255, 255, 255)))
-        for i in range(8):
-            self.__labels.append(font.render(str(i+1), True, (255, 255, 255)))
-        self.__frame = 0
+        if screen:
+            w = screen.get_width()
+            h = screen.get_height()
+            d = math.floor(min(w, h) / 10)
+            di = d - math.floor(d / 10)
+            x = math.floor((w - 10 * d) / 2)
+            y = math.floor((h - 10 * d) / 2)
+            self.__dims = x, y, d, di
+            # area of each pad, only pads whose color or pressed state changed are redrawn
+            self.__rects = [Rect(x + d * (i % 8), y + d * (i // 8 + 2), di, di) for i in range(64)] + \
+                [Rect(x + d * 8, y + d * (i + 2), di, di) for i in range(8)] + \
+                [Rect(x + d * i, y + d, di, di) for i in range(8)]
+            font = pygame.font.SysFont("", d // 2)
+            for label in LABELS:
+                self.__labels.append(font.render(label, True, (255, 255, 255)))
+            for i in range(8):
+                self.__labels.append(
+                    font.render(str(i+1), True, (255, 255, 255)))
+        self.__drawn: List[Optional[Tuple[Tuple[int, int, int], bool]]] = []
+        self.__dirty: List[Rect] = []
+        # areas drawn over by others, the labels within are drawn again
+        self.__covered: List[Rect] = []
+        self.__reads = 0
+        self.__writes = 0
         midiIn = midiOut = None
         for i in range(pygame.midi.get_count()):
             _, name, input, output, opened = pygame.midi.get_device_info(i)
@@ -76,29 +110,95 @@ class Launchpad:
         self.__work = [0x04] * 80
         self.__pressed = [False] * 80
         self.__mouse: List[Optional[int]] = [None, None, None]
+        # MIDI input is read by its own thread, which wakes up wait
+        self.__events: queue.Queue[list] = queue.Queue()
+        self.__pending: List[list] = []
+        # event of the mirror returned by wait
+        self.__pendingEvent: Optional[pygame.event.Event] = None
+        self.__reading = not isinstance(self.__midiIn, NoopMidi)
+        self.__reader = threading.Thread(target=self.__read, daemon=True)
+        if self.__reading:
+            self.__reader.start()
 
     def close(self) -> None:
+        if self.__reading:
+            self.__reading = False
+            self.__reader.join()
         self.__midiOut.write_short(0xb0, 0x00, 0x00)
         self.__midiIn.close()
         self.__midiOut.close()
 
+    def wait(self, timeout: float) -> None:
+        """
+        Waits until MIDI input arrives, the mirror gets an event (e.g. of the
+        mouse), or the timeout in seconds expires.
+        """
+        if self.__pending or self.__pendingEvent:
+            return
+        if self.__screen:
+            if self.__events.empty():
+                # a timeout of 0 would wait forever
+                event = pygame.event.wait(max(math.ceil(timeout * 1000), 1))
+                if event.type != locals.NOEVENT:
+                    self.__pendingEvent = event
+            return
+        try:
+            self.__pending.append(self.__events.get(timeout=timeout))
+        except queue.Empty:
+            pass
+
+    def timeout(self) -> float:
+        """
+        Returns the seconds until the blink phase of the mirror changes, if it
+        shows blinking pads.
+        """
+        if not self.__screen or not any(v & 0x08 and v & 0x33 for v in self.__work):
+            return math.inf
+        return (BLINK_PERIOD - pygame.time.get_ticks() % BLINK_PERIOD) / 1000
+
+    def __read(self) -> None:
+        while self.__reading:
+            self.__reads += 1
+            if self.__midiIn.poll():
+                self.__reads += 1
+                self.__events.put(self.__midiIn.read(READ_BATCH))
+                if self.__screen:
+                    pygame.event.post(pygame.event.Event(_MIDI_EVENT))
+            else:
+                time.sleep(READ_INTERVAL)
+
     def poll(self) -> Generator[Tuple[int, int], None, None]:
-        while self.__midiIn.poll():
-            c, i, v, _ = cast(List[int], self.__midiIn.read(1)[0][0])
-            if c == 0x90:
-                r = i // 16
-                i = i % 16
-                if i < 8:
-                    self.__pressed[i + r * 8] = True if v else False
-                    yield i + r * 8, v
-                else:
-                    self.__pressed[r + 64] = True if v else False
-                    yield r + 64, v
-            elif c == 0xb0:
-                self.__pressed[i - 32] = True if v else False
-                yield i - 32, v
+        while True:
+            if self.__pending:
+                events = self.__pending.pop(0)
+            else:
+                try:
+                    events = self.__events.get_nowait()
+                except queue.Empty:
+                    break
+            for event in events:
+                c, i, v, _ = cast(List[int], event[0])
+                if c == 0x90:
+                    r = i // 16
+                    i = i % 16
+                    if i < 8:
+                        self.__pressed[i + r * 8] = True if v else False
+                        yield i + r * 8, v
+                    else:
+                        self.__pressed[r + 64] = True if v else False
+                        yield r + 64, v
+                elif c == 0xb0:
+                    self.__pressed[i - 32] = True if v else False
+                    yield i - 32, v
 
-        for event in pygame.event.get():
+        if not self.__screen:
+            return
+
+        events = pygame.event.get()
+        if self.__pendingEvent:
+            events.insert(0, self.__pendingEvent)
+            self.__pendingEvent = None
+        for event in events:
             if event.type == locals.MOUSEBUTTONDOWN and event.button in (1, 2, 3):
                 x, y, d, _ = self.__dims
                 i = (event.pos[0] - x) // d
@@ -129,74 +229,123 @@ class Launchpad:
             self.__work[i] = v
 
     def refresh(self) -> int:
-        self.__draw_screen()
+        self.draw()
+        return self.send()
+
+    def draw(self) -> None:
+        """
+        Draws the pads on the screen, if the launchpad is mirrored.
+        """
+        if self.__screen:
+            self.__draw_screen()
+
+    def send(self) -> int:
+        """
+        Sends the changed LEDs to the launchpad, returns the number of MIDI messages.
+        """
         changes = [(i, v) for i, v in enumerate(
             self.__work) if v != self.__current[i]]
         n = len(changes)
         if n == 0:
             return 0
-        s = [(i, v) for i, v in enumerate(self.__work) if v != 0x04]
-        ns = len(s)
-        if not FAST_MODE or n < 40 or ns < 38:
-            if n > ns + 2:
-                changes = s
-                n = ns + 2
-                self.__midiOut.write_short(0xb0, 0x00, 0x00)
-                self.__midiOut.write_short(0xb0, 0x00, 0x28)
+        events: List[List] = []
+        if n >= FRAME_CHANGES:
+            # Send the whole frame with rapid LED updates, 2 LEDs per message in the
+            # order of __work, each burst starting after a buffer control message,
+            # which resets the rapid update cursor. Flashing is stopped, buffer 0 is
+            # written while buffer 1 is displayed, then buffer 1 (without blinking
+            # LEDs) while buffer 0 is displayed, and flashing is resumed.
+            events.append([[0xb0, 0x00, 0x21], 0])
+            for i in range(0, 80, 2):
+                events.append(
+                    [[0x92, self.__work[i] & 0x33, self.__work[i + 1] & 0x33], 0])
+            events.append([[0xb0, 0x00, 0x24], 0])
+            for i in range(0, 80, 2):
+                events.append([[0x92, _steady(self.__work[i]),
+                                _steady(self.__work[i + 1])], 0])
+            events.append([[0xb0, 0x00, 0x28], 0])
+        else:
             for i, v in changes:
                 if i < 72:
                     if i < 64:
                         i = (i // 8) * 16 + (i % 8)
                     else:
                         i = (i - 64) * 16 + 8
-                    self.__midiOut.write_short(0x90, i, v)
+                    events.append([[0x90, i, v], 0])
                 else:
-                    self.__midiOut.write_short(0xb0, i + 32, v)
-        else:
-            n = 40
-            for i in range(0, 80, 2):
-                self.__midiOut.write_short(
-                    0x92, self.__work[i], self.__work[i + 1])
+                    events.append([[0xb0, i + 32, v], 0])
+        # a frame has at most 83 events, well below the limit of Output.write
+        self.__midiOut.write(events)
+        self.__writes += 1
         self.__current = self.__work
         self.__work = self.__work.copy()
-        return n
+        return len(events)
+
+    def calls(self) -> Tuple[int, int]:
+        """
+        Returns the number of MIDI input and output calls since the last call.
+        """
+        calls = self.__reads, self.__writes
+        self.__reads = self.__writes = 0
+        return calls
+
+    def cover(self, rects: List[Rect]) -> None:
+        """
+        Marks areas of the screen as drawn over, e.g. by the stats overlay. The
+        next draw draws the pads and labels within them again, and returns them
+        as dirty.
+        """
+        self.__covered += rects
+
+    def dirty(self) -> List[Rect]:
+        """
+        Returns the areas of the screen, which were redrawn since the last call.
+        """
+        dirty = self.__dirty
+        self.__dirty = []
+        return dirty
 
     def __draw_screen(self):
-        screen = self.__screen
+        screen = cast(Surface, self.__screen)
         x, y, d, di = self.__dims
-        screen.fill((0, 0, 0))
-        for i in range(64):
+        if not self.__drawn:
+            screen.fill((0, 0, 0))
+            self.__covered = [screen.get_rect()]
+            self.__drawn = [None] * 80
+        if self.__covered:
+            for i in range(8):
+                r = self.__rects[i + 64]
+                self.__draw_label(i + 8, (r[0] + d + di/6, r[1] + di/4))
+                r = self.__rects[i + 72]
+                self.__draw_label(i, (r[0] + di/4, r[1] - d + di/2))
+            for i in range(80):
+                if self.__rects[i].collidelist(self.__covered) >= 0:
+                    self.__drawn[i] = None
+            self.__dirty += self.__covered
+            self.__covered = []
+        blink = pygame.time.get_ticks() // BLINK_PERIOD % 2 == 0
+        for i in range(80):
             v = self.__work[i]
-            r = (x + d * (i % 8), y + d * ((i // 8) + 2), di, di)
-            if v & 0x33 and (self.__frame < BLINK_PERIOD or (v & 0x08) == 0):
+            if v & 0x33 and (blink or (v & 0x08) == 0):
                 c = ((v & 0x03) << 6, (v & 0x30) << 2, 0)
             else:
                 c = (32, 32, 32)
-            pygame.draw.rect(screen, c, r)
+            drawn = (c, self.__pressed[i])
+            if drawn == self.__drawn[i]:
+                continue
+            self.__drawn[i] = drawn
+            r = self.__rects[i]
+            if i < 64:
+                pygame.draw.rect(screen, c, r)
+            else:
+                pygame.draw.rect(screen, (0, 0, 0), r)
+                pygame.draw.circle(
+                    screen, c, (r[0] + di/2, r[1] + di/2), di/2)
             if self.__pressed[i]:
                 pygame.draw.rect(screen, (0, 0, 255), (r[0], r[1], di/3, di/3))
-        for i in range(8):
-            v = self.__work[i + 64]
-            r = (x + d * 8 + di/2, y + d * (i+2) + di/2)
-            if v & 0x33 and (self.__frame < BLINK_PERIOD or (v & 0x08) == 0):
-                c = ((v & 0x03) << 6, (v & 0x30) << 2, 0)
-            else:
-                c = (32, 32, 32)
-            pygame.draw.circle(screen, c, r, di/2)
-            if self.__pressed[i + 64]:
-                pygame.draw.rect(screen, (0, 0, 255),
-                                 (r[0] - di/2, r[1] - di/2, di/3, di/3))
-            screen.blit(self.__labels[i + 8], (r[0] + d - di/3, r[1] - di/4))
-        for i in range(8):
-            v = self.__work[i + 72]
-            r = (x + d * i + di/2, y + di/2 + d)
-            if v & 0x33 and (self.__frame < BLINK_PERIOD or (v & 0x08) == 0):
-                c = ((v & 0x03) << 6, (v & 0x30) << 2, 0)
-            else:
-                c = (32, 32, 32)
-            pygame.draw.circle(screen, c, r, di/2)
-            if self.__pressed[i + 72]:
-                pygame.draw.rect(screen, (0, 0, 255),
-                                 (r[0] - di/2, r[1] - di/2, di/3, di/3))
-            screen.blit(self.__labels[i], (r[0] - di/4, r[1] - d))
-        self.__frame = (self.__frame + 1) % (BLINK_PERIOD * 2)
+            self.__dirty.append(r)
+
+    def __draw_label(self, i: int, pos: Tuple[float, float]) -> None:
+        label = self.__labels[i]
+        if label.get_rect(topleft=pos).collidelist(self.__covered) >= 0:
+            cast(Surface, self.__screen).blit(label, pos)
@@ -1,24 +1,57 @@
+import os
+from time import perf_counter
+
 import pygame
 import pygame.midi
-from mopyx import action
+from mopyx import action, rendering
 
-from engine import engine
+from engine import HEADLESS, engine
 from launchpad import BUTTON_MIXER, Launchpad
-from project import project
+from overlay import StatsOverlay
+from profiler import FrameProfiler, NoopProfiler
+from project import Autosave, project
 from ui import App
 
-PROJECT_FILE = 'project.json'
+PROJECT_FILE = 'project.svseq'
+# imported, if there is no project file yet
+LEGACY_PROJECT_FILE = 'project.json'
+# show the timings of the audio callback above the Launchpad mirror
+STATS = 'SVSEQ_STATS' in os.environ
+# time the stages of each frame, and write their trace to this file on exit
+PROFILE = os.environ.get('SVSEQ_PROFILE')
+# seconds the main loop sleeps at most without input, to follow tempo changes of
+# Link peers
+MAX_WAIT = 0.1
 
 pygame.init()
 pygame.midi.init()
 
 clock = pygame.time.Clock()
-screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+screen = None if HEADLESS else pygame.display.set_mode(
+    (0, 0), pygame.FULLSCREEN)
 pad = Launchpad(screen)
+overlay = StatsOverlay(screen, engine.audioEngine) if screen and STATS else None
+autosave = None
+profiler = FrameProfiler(PROFILE) if PROFILE else NoopProfiler()
+
+if PROFILE:
+    call_registered_renderers = rendering.call_registered_renderers
+
+    def timed_renderers() -> None:
+        # mopyx renders at the end of the outermost action, whichever it is, so
+        # the time is added to the render stage right there
+        started = perf_counter()
+        try:
+            call_registered_renderers()
+        finally:
+            profiler.add('render', perf_counter() - started)
+
+    rendering.call_registered_renderers = timed_renderers
 
 try:
-    project.load(PROJECT_FILE)
-    engine.initVolume()
+    project.load(PROJECT_FILE, LEGACY_PROJECT_FILE)
+    autosave = Autosave(project, PROJECT_FILE)
+    engine.initInstruments()
     clock.tick(1)
     app = App(pad)
     app.renderUi()
@@ -28,6 +61,7 @@ try:
     def process() -> bool:
         global pressedForExit
         for i, v in pad.poll():
+            dispatched = perf_counter()
             if v:
                 app.buttonPressed(i)
                 if i == BUTTON_MIXER:
@@ -36,20 +70,38 @@ try:
                 app.buttonReleased(i)
                 if i == BUTTON_MIXER:
                     pressedForExit = None
+            profiler.add('dispatch', perf_counter() - dispatched)
+        profiler.mark('poll')
 
         engine.update()
+        profiler.mark('update')
 
         if pressedForExit and pygame.time.get_ticks() - pressedForExit > 2000:
             return False
 
         return True
 
-    while process():
-        pad.refresh()
-        pygame.display.flip()
-        clock.tick(60)
+    while True:
+        profiler.start()
+        if not process():
+            break
+        profiler.mark('render')
+        if overlay:
+            # drawn first, the mirror draws its labels over it again
+            pad.cover(overlay.draw())
+        pad.draw()
+        profiler.mark('draw')
+        pad.send()
+        profiler.mark('midi')
+        if screen:
+            pygame.display.update(pad.dirty())
+        profiler.mark('flip')
+        profiler.end()
+        pad.wait(min(engine.timeout(), pad.timeout(), MAX_WAIT))
 
 finally:
     pad.close()
-    project.dump(PROJECT_FILE)
+    if autosave:
+        autosave.close()
+    profiler.close()
     pygame.quit()
@@ -0,0 +1,92 @@
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import pygame.font
+import pygame.time
+from pygame.rect import Rect
+from pygame.surface import Surface
+
+import audio_engine
+
+# milliseconds between updates of the overlay
+UPDATE_PERIOD = 500
+# per core CPU times, only available on Linux
+PROC_STAT = '/proc/stat'
+
+
+def _cpu_times() -> List[Tuple[int, int]]:
+    """
+    Returns the idle and total time of each core, in clock ticks since boot.
+    """
+    try:
+        with open(PROC_STAT) as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    times = []
+    for line in lines:
+        fields = line.split()
+        if fields and fields[0].startswith('cpu') and fields[0] != 'cpu':
+            values = [int(v) for v in fields[1:]]
+            # idle and iowait
+            times.append((values[3] + values[4], sum(values)))
+    return times
+
+
+class StatsOverlay:
+    """
+    Shows the timings of the audio callback and the headroom of each CPU core
+    above the Launchpad mirror, averaged since the last update.
+    """
+
+    def __init__(self, screen: Surface, audioEngine: audio_engine.Engine) -> None:
+        self.__screen = screen
+        self.__audioEngine = audioEngine
+        d = math.floor(min(screen.get_width(), screen.get_height()) / 10)
+        self.__font = pygame.font.SysFont("", d // 4)
+        self.__rect = Rect(0, 0, screen.get_width(),
+                           3 * self.__font.get_linesize())
+        self.__period = audioEngine.getBufferSize() / audioEngine.getSampleRate()
+        self.__last: Optional[Dict[str, Any]] = None
+        self.__lastCpu = _cpu_times()
+        self.__updated = 0
+
+    def draw(self) -> List[Rect]:
+        """
+        Draws the overlay, if it is due, and returns the redrawn area.
+        """
+        now = pygame.time.get_ticks()
+        if now - self.__updated < UPDATE_PERIOD:
+            return []
+        self.__updated = now
+        stats = self.__audioEngine.getStats()
+        last = self.__last or {k: [0] * len(v) if isinstance(v, list) else 0
+                               for k, v in stats.items()}
+        self.__last = stats
+        n = stats['callbacks'] - last['callbacks']
+        if n == 0:
+            return []
+
+        def ms(key: str) -> str:
+            return f'{(stats[key] - last[key]) / n * 1000:.2f}'
+
+        histogram = [a - b for a, b in zip(stats['histogram'], last['histogram'])]
+        lines = [
+            f'callback {ms("callback")} ms (max {stats["max_callback"] * 1000:.2f}) of '
+            f'{self.__period * 1000:.2f} ms, sunvox {ms("audio")} ms, events {ms("events")} ms',
+            'load ' + ' '.join(f'{h * 100 // n}' for h in histogram) +
+            f' %, underflows {stats["underflows"]}',
+        ]
+        cpu = _cpu_times()
+        if cpu:
+            idle = [(i - li) * 100 // max(t - lt, 1)
+                    for (i, t), (li, lt) in zip(cpu, self.__lastCpu)]
+            self.__lastCpu = cpu
+            lines.append('idle ' + ' '.join(str(i) for i in idle) + ' %')
+        self.__screen.fill((0, 0, 0), self.__rect)
+        y = 0
+        for line in lines:
+            self.__screen.blit(self.__font.render(
+                line, True, (128, 128, 128)), (0, y))
+            y += self.__font.get_linesize()
+        return [self.__rect]
@@ -0,0 +1,116 @@
+import json
+import sys
+from collections import deque
+from time import perf_counter
+from typing import Deque, Dict, List, Tuple
+
+# stages of a frame of the main loop, in order
+STAGES = ('poll', 'dispatch', 'update', 'render', 'draw', 'midi', 'flip')
+# time available for a frame at 60 fps, in seconds
+BUDGET = 1 / 60
+# number of frames the percentiles are computed of
+WINDOW = 600
+# number of frames kept for the trace, about 10 minutes
+TRACE_FRAMES = 36000
+
+
+class NoopProfiler:
+    def start(self) -> None:
+        pass
+
+    def add(self, stage: str, seconds: float) -> None:
+        pass
+
+    def mark(self, stage: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FrameProfiler:
+    """
+    Times the stages of each frame of the main loop. Every WINDOW frames the
+    percentiles of each stage and the frames exceeding BUDGET are printed, the
+    trace of the last frames is written to a file in Chrome's trace event format.
+    """
+
+    def __init__(self, trace: str) -> None:
+        self.__trace = trace
+        self.__origin = perf_counter()
+        self.__frames: Deque[Tuple[float, Dict[str, float]]] = deque(
+            maxlen=TRACE_FRAMES)
+        # start of the frame and of frames exceeding the budget, with their stage
+        # taking the most time
+        self.__missed: Deque[Tuple[float, str]] = deque(maxlen=TRACE_FRAMES)
+        self.__missedInWindow: List[str] = []
+        # frames since the last report, the trace is bounded
+        self.__framesInWindow = 0
+        self.__start = self.__last = 0.0
+        # stages of the current frame, renders before the first one are dropped
+        self.__stages: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+
+    def start(self) -> None:
+        self.__start = self.__last = perf_counter()
+        self.__stages = dict.fromkeys(STAGES, 0.0)
+
+    def add(self, stage: str, seconds: float) -> None:
+        """
+        Adds time to a stage, which is nested in the stage of the next mark.
+        """
+        self.__stages[stage] += seconds
+        self.__last += seconds
+
+    def mark(self, stage: str) -> None:
+        """
+        Ends a stage, it took the time since the last mark.
+        """
+        now = perf_counter()
+        self.__stages[stage] += now - self.__last
+        self.__last = now
+
+    def end(self) -> None:
+        self.__frames.append((self.__start, self.__stages))
+        if perf_counter() - self.__start > BUDGET:
+            cause = max(self.__stages, key=lambda s: self.__stages[s])
+            self.__missed.append((self.__start, cause))
+            self.__missedInWindow.append(cause)
+        self.__framesInWindow += 1
+        if self.__framesInWindow == WINDOW:
+            self.__report()
+
+    def close(self) -> None:
+        self.__report()
+        events = []
+        for start, stages in self.__frames:
+            ts = (start - self.__origin) * 1e6
+            for stage in STAGES:
+                events.append({'name': stage, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': ts, 'dur': stages[stage] * 1e6})
+                ts += stages[stage] * 1e6
+        for start, cause in self.__missed:
+            events.append({'name': 'missed', 'ph': 'i', 'pid': 0, 'tid': 0, 's': 't',
+                           'ts': (start - self.__origin) * 1e6, 'args': {'cause': cause}})
+        with open(self.__trace, 'w') as f:
+            json.dump({'traceEvents': events}, f)
+
+    def __report(self) -> None:
+        if not self.__framesInWindow:
+            return
+        frames = list(self.__frames)[-self.__framesInWindow:]
+        self.__framesInWindow = 0
+        print(f'{"":<10}{"p50":>8}{"p95":>8}{"p99":>8}{"max":>8} (ms)',
+              file=sys.stderr)
+        for stage in STAGES:
+            times = sorted(stages[stage] * 1000 for _, stages in frames)
+            p = [times[int(q * (len(times) - 1))] for q in (.5, .95, .99, 1)]
+            print(f'{stage:<10}' + ''.join(f'{t:>8.2f}' for t in p),
+                  file=sys.stderr)
+        causes = {c: self.__missedInWindow.count(c)
+                  for c in set(self.__missedInWindow)}
+        print(f'missed {len(self.__missedInWindow)} of {len(frames)} frames' +
+              ''.join(f', {c} {n}' for c, n in causes.items()), file=sys.stderr)
+        self.__missedInWindow = []
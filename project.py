@@ -1,7 +1,14 @@
 import json
-from typing import Any, Dict, List, Optional, Tuple, cast
+import os
+import struct
+import sys
+from array import array
+from itertools import count
+from math import nan
+from typing import (Any, Dict, Hashable, Iterable, List, Optional, Sequence,
+                    Tuple, Union, overload)
 
-from mopyx import action, computed
+from mopyx import action, computed, render
 
 from model import model
 
@@ -40,20 +47,215 @@ class Project:
         self.quantum = d['quantum']
         self.swing = d['swing']
         for i in range(len(self.tracks)):
-            self.tracks[i].from_dict(d['tracks'][i])
+            self.tracks[i].from_dict(d['tracks'][i], self.__legacy_steps())
+
+    def to_bytes(self) -> bytes:
+        tracks = [(t, [p.to_bytes() for p in t.patterns]) for t in self.tracks]
+        offset = _HEADER.size + sum(_TRACK.size + len(t.sequence) + len(ps) * _PATTERN.size
+                                    for t, ps in tracks)
+        index = [_HEADER.pack(MAGIC, VERSION, self.tempo, self.latency,
+                              self.quantum, self.swing, len(tracks))]
+        data = []
+        for t, ps in tracks:
+            index.append(_TRACK.pack(t.muted, t.volume, t.percussion,
+                         t.instrument, t.resolution, len(t.sequence), len(ps)))
+            index.append(bytes(t.sequence))
+            for p, d in zip(t.patterns, ps):
+                index.append(_PATTERN.pack(
+                    offset, p.capacity, p.steps, p.octave, p.empty))
+                data.append(d)
+                offset += len(d)
+        return b''.join(index + data)
+
+    @action
+    def from_bytes(self, data: bytes) -> None:
+        magic, version, self.tempo, self.latency, self.quantum, self.swing, n = _HEADER.unpack_from(
+            data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Unsupported project file')
+        offset = _HEADER.size
+        for i in range(n):
+            offset = self.tracks[i].from_bytes(data, offset)
 
     def dump(self, name: str) -> None:
-        with open(name, 'w') as f:
-            json.dump(self.dict, f)
+        data = json.dumps(self.dict).encode() if name.endswith(
+            '.json') else self.to_bytes()
+        # replace the file atomically, a crash never leaves a partial project behind
+        with open(name + '.tmp', 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(name + '.tmp', name)
+
+    def load(self, name: str, legacy: Optional[str] = None) -> None:
+        """
+        Loads the project file and replays its journal. Without project file, the
+        project is imported from the legacy file, if given.
+        """
+        if legacy and not os.path.exists(name):
+            self.__read(legacy)
+        else:
+            self.__read(name)
+        try:
+            with open(name + JOURNAL, 'r') as f:
+                self.__replay(f)
+        except IOError:
+            pass
 
-    def load(self, name: str) -> None:
+    def __read(self, name: str) -> None:
         try:
-            with open(name, 'r') as f:
-                d = json.load(f)
-                self.from_dict(d)
+            with open(name, 'rb') as f:
+                data = f.read()
+                if data.startswith(MAGIC):
+                    self.from_bytes(data)
+                else:
+                    self.from_dict(json.loads(data))
         except IOError:
             pass
 
+    def __legacy_steps(self) -> int:
+        # projects without pattern lengths played one quantum of each pattern
+        return min(self.quantum * 4, 32)
+
+    @action
+    def __replay(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                # torn write of the last entry
+                break
+            if 'track' not in e:
+                for k, v in e.items():
+                    setattr(self, k, v)
+                continue
+            t = self.tracks[e.pop('track')]
+            if 'pattern' not in e:
+                for k, v in e.items():
+                    setattr(t, k, v)
+                continue
+            p = t.patterns[e['pattern']]
+            if 'step' in e:
+                p.note(e['step']).from_dict(e['note'])
+            else:
+                p.octave = e['octave']
+                p.resize(e['steps'])
+
+
+# binary project file: header, then per track its settings and the index of
+# its patterns, followed by the encoded notes of all patterns
+MAGIC = b'SVSQ'
+VERSION = 1
+# magic, version, tempo, latency, quantum, swing, number of tracks
+_HEADER = struct.Struct('<4sHHHHHH')
+# muted, volume, percussion, instrument, resolution, length of sequence, number
+# of patterns, followed by the sequence
+_TRACK = struct.Struct('<?d?HBBB')
+# offset of notes, number of encoded steps, steps, octave, empty
+_PATTERN = struct.Struct('<IHHB?')
+
+# journal file, relative to the project file
+JOURNAL = '.journal'
+# number of journal entries before they are compacted into the project file
+COMPACT_AFTER = 1000
+
+
+class Autosave:
+    """
+    Appends every edit of the project to a journal, which is replayed by
+    Project.load after a crash. Entries hold the new state of the project
+    settings, a track or a single note.
+    """
+
+    def __init__(self, project: Project, name: str) -> None:
+        self.__project = project
+        self.__name = name
+        self.__file = open(name + JOURNAL, 'a')
+        self.__entries = 0
+        self.__journaled: Dict[Hashable, Dict[str, Any]] = {}
+        self.__deferred: Dict[Hashable, Tuple[int, int, bytes]] = {}
+        self.__settings_changed()
+        for i, t in enumerate(project.tracks):
+            self.__track_changed(i)
+            for p in range(len(t.patterns)):
+                self.__pattern_changed(i, p)
+
+    def compact(self) -> None:
+        self.__project.dump(self.__name)
+        self.__file.seek(0)
+        self.__file.truncate()
+        self.__entries = 0
+
+    def close(self) -> None:
+        self.compact()
+        self.__file.close()
+
+    @render
+    def __settings_changed(self) -> None:
+        p = self.__project
+        self.__write(None, {
+            'tempo': p.tempo,
+            'latency': p.latency,
+            'quantum': p.quantum,
+            'swing': p.swing
+        })
+
+    @render
+    def __track_changed(self, i: int) -> None:
+        t = self.__project.tracks[i]
+        self.__write(i, {
+            'track': i,
+            'muted': t.muted,
+            'volume': t.volume,
+            'percussion': t.percussion,
+            'instrument': t.instrument,
+            'resolution': t.resolution,
+            'sequence': list(t.sequence)
+        })
+
+    @render
+    def __pattern_changed(self, i: int, p: int) -> None:
+        pattern = self.__project.tracks[i].patterns[p]
+        if pattern.deferred:
+            # keep the encoded notes, so they are only decoded once the pattern is loaded
+            pattern.observe()
+            self.__deferred[(i, p)] = (
+                pattern.octave, pattern.steps, pattern.to_bytes())
+            return
+        deferred = self.__deferred.pop((i, p), None)
+        if deferred is not None and deferred != (pattern.octave, pattern.steps, pattern.to_bytes()):
+            # edited while deferred, journal the whole pattern
+            self.__journaled[(i, p)] = {}
+            for s in range(pattern.capacity):
+                self.__journaled[(i, p, s)] = {}
+        journaled = (i, p) in self.__journaled
+        self.__write((i, p), {'track': i, 'pattern': p,
+                     'octave': pattern.octave, 'steps': pattern.steps})
+        # each note is journaled by a render of its own, so an edit only compares
+        # the edited note
+        for s in range(pattern.capacity):
+            if journaled and (i, p, s) not in self.__journaled:
+                # added by lengthening the pattern, the project file lacks it
+                self.__journaled[(i, p, s)] = {
+                    'track': i, 'pattern': p, 'step': s, 'note': _EMPTY_NOTE}
+            self.__note_changed(i, p, s, pattern.note(s))
+
+    @render
+    def __note_changed(self, i: int, p: int, s: int, note: 'Note') -> None:
+        self.__write((i, p, s), {'track': i, 'pattern': p,
+                     'step': s, 'note': note.dict})
+
+    def __write(self, key: Hashable, entry: Dict[str, Any]) -> None:
+        journaled = self.__journaled.get(key)
+        self.__journaled[key] = entry
+        if journaled is None or journaled == entry:
+            return
+        self.__file.write(json.dumps(entry) + '\n')
+        self.__file.flush()
+        self.__entries += 1
+        if self.__entries >= COMPACT_AFTER:
+            self.compact()
+
 
 @model
 class Track:
@@ -62,6 +264,8 @@ class Track:
         self.volume = 1.0
         self.percussion = percussion
         self.instrument = instrument
+        # steps per beat, one of RESOLUTIONS
+        self.resolution = 4
         self.sequence: List[int] = []
         self.patterns: List[Pattern] = []
         for i in range(8):
@@ -74,92 +278,514 @@ class Track:
             'volume': self.volume,
             'percussion': self.percussion,
             'instrument': self.instrument,
+            'resolution': self.resolution,
             'sequence': self.sequence,
             'patterns': [p.dict for p in self.patterns]
         }
 
     @action
-    def from_dict(self, d: Dict[str, Any]) -> None:
+    def from_dict(self, d: Dict[str, Any], steps: int = 32) -> None:
         self.muted = d['muted']
         self.volume = d['volume']
         self.percussion = d['percussion']
         self.instrument = d['instrument']
+        self.resolution = d.get('resolution', 4)
         self.sequence = d['sequence']
         for i in range(len(self.patterns)):
-            self.patterns[i].from_dict(d['patterns'][i])
+            self.patterns[i].from_dict(d['patterns'][i], steps)
+
+    @action
+    def from_bytes(self, data: bytes, offset: int) -> int:
+        self.muted, self.volume, self.percussion, self.instrument, self.resolution, n, m = _TRACK.unpack_from(
+            data, offset)
+        offset += _TRACK.size
+        self.sequence = list(data[offset:offset + n])
+        offset += n
+        for i in range(m):
+            o, capacity, length, octave, empty = _PATTERN.unpack_from(
+                data, offset)
+            offset += _PATTERN.size
+            self.patterns[i].defer(
+                memoryview(data)[o:o + NoteArrays.size(capacity)], octave, empty, length)
+        return offset
 
 
 @model
 class Pattern:
-    def __init__(self) -> None:
-        self.notes: List[Note] = []
-        for i in range(32):
-            self.notes.append(Note())
+    def __init__(self, steps: int = 32) -> None:
+        self.__arrays = NoteArrays(steps)
+        # views of all encoded steps, including those beyond the length of the
+        # pattern, which are kept when it is shortened
+        self.__notes: Tuple[Note, ...] = ()
+        # 1 - MAX_STEPS
+        self.steps = steps
+        self.notes: Tuple[Note, ...] = ()
+        self.__update_notes()
         # 0 - 8
         self.octave = 4
+        # the notes are deferred until the pattern is loaded or edited, until
+        # then the empty flag of the project file is used
+        self.__loaded = True
+        self.__empty = True
+
+    @property
+    def deferred(self) -> bool:
+        """
+        Whether the pattern is neither loaded nor edited since it was read from
+        a binary project file. Its notes are decoded on first access.
+        """
+        return not self.__loaded
+
+    @property
+    def capacity(self) -> int:
+        """
+        The number of encoded steps, at least the length of the pattern.
+        """
+        return self.__arrays.steps
 
     @computed
     def empty(self) -> bool:
-        for n in self.notes:
-            if not n.empty:
-                return False
-        return True
+        self._mopyx_register_active_renderers(_INDEX)
+        if self.deferred:
+            return self.__empty
+        return not self.__arrays.mask() & ((1 << self.steps) - 1)
+
+    def non_empty(self) -> List[int]:
+        """
+        Returns the non-empty steps within the length of the pattern, in order.
+        Only changes of the steps being empty or not are tracked.
+        """
+        self._mopyx_register_active_renderers(_INDEX)
+        mask = self.__arrays.mask() & ((1 << self.steps) - 1)
+        steps = []
+        while mask:
+            bit = mask & -mask
+            steps.append(bit.bit_length() - 1)
+            mask ^= bit
+        return steps
 
     @computed
     def dict(self) -> Dict[str, Any]:
         return {
             'octave': self.octave,
-            'notes': [n.dict for n in self.notes]
+            'steps': self.steps,
+            'notes': [n.dict for n in self.__notes]
         }
 
     @action
-    def from_dict(self, d: Dict[str, Any]) -> None:
+    def from_dict(self, d: Dict[str, Any], steps: int = 32) -> None:
+        self.__loaded = True
         self.octave = d['octave']
-        for i in range(len(self.notes)):
-            self.notes[i].from_dict(d['notes'][i])
+        notes = d['notes'][:MAX_STEPS]
+        self.__arrays.assign(NoteArrays(max(len(notes), 1)))
+        a = self.__arrays
+        for i, n in enumerate(notes):
+            a.tone[i] = n['tone']
+            for j in range(3):
+                c = n['chord'][j]
+                a.chord[j][i] = NO_INTERVAL if c is None else c
+            for j in range(5):
+                c = n['control'][j]
+                a.control[j][i] = nan if c is None else c
+            a.trigger[i] = n['trigger']
+        self.__resize(d.get('steps', steps))
+        self.__changed()
 
+    @action
+    def defer(self, source: memoryview, octave: int, empty: bool, steps: int) -> None:
+        self.__loaded = False
+        self.octave = octave
+        self.__empty = empty
+        self.__arrays.defer(source)
+        self.__resize(steps)
+        self.__changed()
 
-@model
-class Note:
-    def __init__(self) -> None:
+    @action
+    def load(self) -> None:
+        if self.deferred:
+            self.__loaded = True
+            self.__changed()
+
+    def observe(self) -> None:
+        for n in self.notes:
+            n._observe()
+
+    def note(self, i: int) -> 'Note':
+        """
+        Returns the note of a step, which may be beyond the length of the pattern.
+        """
+        if i >= len(self.__notes):
+            self.__arrays.grow(i + 1)
+            self.__update_notes()
+        return self.__notes[i]
+
+    def to_bytes(self) -> bytes:
+        return self.__arrays.to_bytes()
+
+    @action
+    def resize(self, steps: int) -> None:
+        """
+        Changes the length of the pattern. The notes of the steps beyond its
+        length are kept, so they return when it is lengthened again.
+        """
+        if steps != self.steps:
+            self.__loaded = True
+            self.__resize(steps)
+            self.__changed()
+
+    @action
+    def clear(self) -> None:
+        self.__loaded = True
+        self.__arrays.assign(NoteArrays(self.capacity))
+        self.__changed()
+
+    @action
+    def copy_from(self, other: 'Pattern') -> None:
+        self.__loaded = True
+        self.__arrays.assign(other.__arrays)
+        self.__resize(other.steps)
+        self.__changed()
+
+    @action
+    def transpose(self, i: int) -> None:
+        self.__loaded = True
+        tone = self.__arrays.tone
+        tone[:] = array('b', (max(min(t + i, 120), 1) if t > 0 else t
+                              for t in tone))
+        self.__changed()
+
+    def _step_changed(self, i: int) -> None:
+        if self.__arrays.update(i):
+            self._mopyx_register_refresh(_INDEX)
+
+    def __resize(self, steps: int) -> None:
+        steps = max(min(steps, MAX_STEPS), 1)
+        if steps > self.__arrays.steps:
+            self.__arrays.grow(steps)
+        self.steps = steps
+        self.__update_notes()
+
+    def __update_notes(self) -> None:
+        n = self.__arrays.steps
+        if len(self.__notes) != n:
+            self.__notes = self.__notes[:n] + tuple(
+                Note(self, self.__arrays, i) for i in range(len(self.__notes), n))
+        if len(self.notes) != self.steps:
+            self.notes = tuple(self.__notes[:self.steps])
+
+    def __changed(self) -> None:
+        self.__arrays.index = None
+        self._mopyx_register_refresh(_INDEX)
+        for n in self.__notes:
+            n._changed()
+
+
+# key of the index of non-empty steps, for tracking by mopyx
+_INDEX = 'index'
+# maximum length of a pattern
+MAX_STEPS = 256
+# steps per beat a track can be played at, i.e. 1/8 to 1/64 notes
+RESOLUTIONS = (2, 4, 8, 16)
+
+# chord interval not set
+NO_INTERVAL = -128
+# dict of a note without any settings
+_EMPTY_NOTE = {'tone': 0, 'chord': (None, None, None),
+               'control': [None] * 5, 'trigger': 0}
+
+
+class NoteArrays:
+    """
+    The notes of a pattern as struct of arrays, indexed by step. Unset chord
+    intervals are stored as NO_INTERVAL, unset controls as NaN. Arrays can be
+    deferred to an encoded source, which is decoded on first access. The
+    non-empty steps are indexed by a bit mask, which writers keep up to date.
+    """
+
+    def __init__(self, steps: int) -> None:
+        self.steps = steps
+        self.source: Optional[memoryview] = None
+        # bit mask of the non-empty steps, None until computed
+        self.index: Optional[int] = 0
+        # changed whenever a step is written
+        self.revisions = array('L', [next(_REVISIONS)]) * steps
         # -1: note off
         # 0: silence
         # 1 - 120: C0 - B9
-        self.tone = 0
-        self.chord: Tuple[Optional[int], Optional[int],
-                          Optional[int]] = (None, None, None)
-        # None | 0.0 - 1.0
-        self.control: List[Optional[float]] = [None] * 5
+        self.tone = array('b', bytes(steps))
+        self.chord = [array('b', [NO_INTERVAL]) * steps for _ in range(3)]
+        # NaN | 0.0 - 1.0
+        self.control = [array('d', [nan]) * steps for _ in range(5)]
         # 0: once
         # 1: twice (1/32)
         # 2: 3 times (1/24, 2/24)
-        self.trigger = 0
+        self.trigger = array('b', bytes(steps))
 
-    @computed
-    def empty(self) -> bool:
-        if self.tone or self.chord != (None, None, None) or self.trigger:
+    @staticmethod
+    def size(steps: int) -> int:
+        return steps * (1 + 3 + 5 * 8 + 1)
+
+    def __getattr__(self, name: str) -> Any:
+        # only called while the arrays are deferred
+        if name not in _ARRAYS or self.__dict__.get('source') is None:
+            raise AttributeError(name)
+        self.decode()
+        return getattr(self, name)
+
+    def empty(self, i: int) -> bool:
+        if self.tone[i] or self.trigger[i]:
             return False
+        for c in self.chord:
+            if c[i] != NO_INTERVAL:
+                return False
         for c in self.control:
-            if c is not None:
+            if c[i] == c[i]:
                 return False
         return True
 
-    @computed
+    def mask(self) -> int:
+        """
+        Returns the bit mask of the non-empty steps.
+        """
+        if self.index is None:
+            self.index = 0
+            for i in range(self.steps):
+                if not self.empty(i):
+                    self.index |= 1 << i
+        return self.index
+
+    def update(self, i: int) -> bool:
+        """
+        Updates the revision of a written step and its bit in the mask, returns
+        whether the bit changed.
+        """
+        self.revisions[i] = next(_REVISIONS)
+        if self.index is None:
+            return False
+        index = self.index & ~(1 << i) if self.empty(i) else self.index | 1 << i
+        changed = index != self.index
+        self.index = index
+        return changed
+
+    def grow(self, steps: int) -> None:
+        """
+        Appends empty steps up to the given number of steps.
+        """
+        self.decode()
+        n = steps - self.steps
+        self.revisions.extend(array('L', [next(_REVISIONS)]) * n)
+        self.tone.extend(bytes(n))
+        for c in self.chord:
+            c.extend(array('b', [NO_INTERVAL]) * n)
+        for c in self.control:
+            c.extend(array('d', [nan]) * n)
+        self.trigger.extend(bytes(n))
+        self.steps = steps
+
+    def defer(self, source: memoryview) -> None:
+        for name in _ARRAYS:
+            self.__dict__.pop(name, None)
+        self.steps = len(source) // NoteArrays.size(1)
+        self.source = source
+        self.index = None
+        self.revisions = array('L', [next(_REVISIONS)]) * self.steps
+
+    def decode(self) -> None:
+        source = self.source
+        if source is None:
+            return
+        offset = 0
+
+        def read(typecode: str) -> array:
+            nonlocal offset
+            a = array(typecode)
+            n = self.steps * a.itemsize
+            a.frombytes(source[offset:offset + n])
+            if sys.byteorder == 'big':
+                a.byteswap()
+            offset += n
+            return a
+
+        self.tone = read('b')
+        self.chord = [read('b') for _ in range(3)]
+        self.control = [read('d') for _ in range(5)]
+        self.trigger = read('b')
+        self.source = None
+
+    def to_bytes(self) -> bytes:
+        if self.source is not None:
+            return bytes(self.source)
+        arrays = [self.tone, *self.chord, *self.control, self.trigger]
+        if sys.byteorder == 'big':
+            arrays = [array(a.typecode, a) for a in arrays]
+            for a in arrays:
+                a.byteswap()
+        return b''.join(a.tobytes() for a in arrays)
+
+    def assign(self, other: 'NoteArrays') -> None:
+        self.steps = other.steps
+        self.source = None
+        self.index = other.index
+        self.revisions = array('L', [next(_REVISIONS)]) * self.steps
+        self.tone = array('b', other.tone)
+        self.chord = [array('b', c) for c in other.chord]
+        self.control = [array('d', c) for c in other.control]
+        self.trigger = array('b', other.trigger)
+
+
+_ARRAYS = ('tone', 'chord', 'control', 'trigger')
+# revisions of steps, unique across all patterns
+_REVISIONS = count(1)
+
+
+class Note:
+    """
+    View of one step of a pattern. Reads and writes are tracked by mopyx per step
+    on the owning pattern.
+    """
+    __slots__ = ('__pattern', '__arrays', '__i', '__key')
+
+    def __init__(self, pattern: Pattern, arrays: NoteArrays, i: int) -> None:
+        self.__pattern = pattern
+        self.__arrays = arrays
+        self.__i = i
+        self.__key = f'notes[{i}]'
+
+    @property
+    def tone(self) -> int:
+        self._observe()
+        return self.__arrays.tone[self.__i]
+
+    @tone.setter
+    @action
+    def tone(self, tone: int) -> None:
+        self.__arrays.tone[self.__i] = tone
+        self._changed()
+
+    @property
+    def chord(self) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        self._observe()
+        c = self.__arrays.chord
+        i = self.__i
+        return (_interval(c[0][i]), _interval(c[1][i]), _interval(c[2][i]))
+
+    @chord.setter
+    @action
+    def chord(self, chord: Tuple[Optional[int], Optional[int], Optional[int]]) -> None:
+        for j in range(3):
+            c = chord[j]
+            self.__arrays.chord[j][self.__i] = NO_INTERVAL if c is None else c
+        self._changed()
+
+    @property
+    def control(self) -> 'Control':
+        self._observe()
+        return Control(self)
+
+    @control.setter
+    @action
+    def control(self, control: Sequence[Optional[float]]) -> None:
+        for j in range(5):
+            self.set_control(j, control[j])
+
+    def get_control(self, j: int) -> Optional[float]:
+        self._observe()
+        c = self.__arrays.control[j][self.__i]
+        return None if c != c else c
+
+    @action
+    def set_control(self, j: int, c: Optional[float]) -> None:
+        self.__arrays.control[j][self.__i] = nan if c is None else c
+        self._changed()
+
+    @property
+    def trigger(self) -> int:
+        self._observe()
+        return self.__arrays.trigger[self.__i]
+
+    @trigger.setter
+    @action
+    def trigger(self, trigger: int) -> None:
+        self.__arrays.trigger[self.__i] = trigger
+        self._changed()
+
+    @property
+    def empty(self) -> bool:
+        self._observe()
+        return self.__arrays.empty(self.__i)
+
+    @property
+    def revision(self) -> int:
+        """
+        Changes whenever the note is written, compiled notes can be kept until then.
+        """
+        self._observe()
+        return self.__arrays.revisions[self.__i]
+
+    @property
     def dict(self) -> Dict[str, Any]:
         return {
             'tone': self.tone,
             'chord': self.chord,
-            'control': self.control,
+            'control': list(self.control),
             'trigger': self.trigger
         }
 
     @action
     def from_dict(self, d: Dict[str, Any]) -> None:
         self.tone = d['tone']
-        self.chord = cast(Tuple[Optional[int], Optional[int],
-                                Optional[int]], tuple(d['chord']))
+        self.chord = (d['chord'][0], d['chord'][1], d['chord'][2])
         self.control = d['control']
         self.trigger = d['trigger']
 
+    def _changed(self) -> None:
+        self.__pattern._mopyx_register_refresh(self.__key)
+        self.__pattern._step_changed(self.__i)
+
+    def _observe(self) -> None:
+        self.__pattern._mopyx_register_active_renderers(self.__key)
+
+
+class Control(Sequence[Optional[float]]):
+    """
+    The controls of a note, writes go through to the pattern.
+    """
+
+    def __init__(self, note: Note) -> None:
+        self.__note = note
+
+    @overload
+    def __getitem__(self, j: int) -> Optional[float]:
+        ...
+
+    @overload
+    def __getitem__(self, j: slice) -> List[Optional[float]]:
+        ...
+
+    def __getitem__(self, j: Union[int, slice]) -> Union[Optional[float], List[Optional[float]]]:
+        if isinstance(j, slice):
+            return self.copy()[j]
+        if not -5 <= j < 5:
+            raise IndexError(j)
+        return self.__note.get_control(j % 5)
+
+    def __setitem__(self, j: int, c: Optional[float]) -> None:
+        if not -5 <= j < 5:
+            raise IndexError(j)
+        self.__note.set_control(j % 5, c)
+
+    def __len__(self) -> int:
+        return 5
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def copy(self) -> List[Optional[float]]:
+        return [self.__note.get_control(j) for j in range(5)]
+
+
+def _interval(c: int) -> Optional[int]:
+    return None if c == NO_INTERVAL else c
+
 
 project = Project()
@@ -5,19 +5,24 @@ from launchpad import BUTTON_SCENE_1, Launchpad
 from project import Pattern, Track
 
 from .padget import Padget
+from .steps import PAGE_STEPS
 
 
 class ChordsAndTrigger(Padget):
-    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, tn: int):
+    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, tn: int, page: int):
         super().__init__(pad)
         self.__pattern = pattern
         self.__track = track
         self.__tn = tn
+        # first step shown
+        self.__offset = page * PAGE_STEPS
+        # step of the pressed pad
         self.__pressed: Optional[int] = None
 
     def _buttonPressed(self, i: int) -> bool:
-        if i < 32 and self.__pressed is None and self.__pattern.notes[i].tone > 0:
-            self.__pressed = i
+        s = self.__offset + i
+        if i < 32 and self.__pressed is None and s < len(self.__pattern.notes) and self.__pattern.notes[s].tone > 0:
+            self.__pressed = s
             return True
         if 40 <= i < 48 and not self.__track.percussion:
             if self.__pressed is not None:
@@ -42,7 +47,7 @@ class ChordsAndTrigger(Padget):
         return False
 
     def _buttonReleased(self, i: int) -> bool:
-        if i == self.__pressed:
+        if i < 32 and self.__offset + i == self.__pressed:
             self.__pressed = None
             return True
         if 40 <= i < 48 and not self.__track.percussion:
@@ -54,18 +59,29 @@ class ChordsAndTrigger(Padget):
 
     def _render(self) -> None:
         self._pad.set(BUTTON_SCENE_1 + 1, 0x033)
-        notes = self.__pattern.notes
-        for i in range(32):
-            if notes[i].tone > 0:
-                c = 0x001 if (self.__track.percussion or notes[i].chord == (
-                    None, None, None)) and notes[i].trigger == 0 else 0x032
-            else:
-                c = 0x000
-            if engine.uiState.playing and engine.uiState.phase * 4 == i:
-                c |= 0x100
-            self._pad.set(i, c)
+        self._renderPads(range(32), self.__step_color)
         for i in range(32, 40):
             self._pad.set(i, 0x000)
+        self._renderGroup(self.__render_chords)
+        for i in range(50, 64):
+            self._pad.set(i, 0x000)
+
+    def __step_color(self, i: int) -> int:
+        s = self.__offset + i
+        notes = self.__pattern.notes
+        if s >= len(notes):
+            return 0x000
+        if notes[s].tone > 0:
+            c = 0x001 if (self.__track.percussion or notes[s].chord == (
+                None, None, None)) and notes[s].trigger == 0 else 0x032
+        else:
+            c = 0x000
+        if engine.uiState.playing and engine.uiState.playhead(self.__tn, s):
+            c |= 0x100
+        return c
+
+    def __render_chords(self) -> None:
+        notes = self.__pattern.notes
         for i in range(40, 48):
             if self.__track.percussion:
                 self._pad.set(i, 0x000)
@@ -75,8 +91,6 @@ class ChordsAndTrigger(Padget):
         for i in range(48, 50):
             self._pad.set(
                 i, 0x000 if self.__pressed is None else 0x133 if notes[self.__pressed].trigger == i - 47 else 0x033)
-        for i in range(50, 64):
-            self._pad.set(i, 0x000)
 
 
 _chords = [
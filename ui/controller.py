@@ -5,22 +5,29 @@ from launchpad import BUTTON_SCENE_1, Launchpad
 from project import Pattern
 
 from .padget import Padget
+from .steps import PAGE_STEPS
 
 
 class Controller(Padget):
-    def __init__(self, pad: Launchpad, pattern: Pattern, cn: int):
+    def __init__(self, pad: Launchpad, pattern: Pattern, tn: int, cn: int, page: int):
         super().__init__(pad)
         self.__pattern = pattern
+        self.__tn = tn
         self.__cn = cn
+        # first step shown
+        self.__offset = page * PAGE_STEPS
+        # step of the pressed pad
         self.__pressed: Optional[int] = None
 
     def _buttonPressed(self, i: int) -> bool:
         if i < 32:
+            if self.__offset + i >= len(self.__pattern.notes):
+                return True
             if self.__pressed is None:
-                self.__pressed = i
+                self.__pressed = self.__offset + i
             else:
                 s = self.__pressed
-                e = i
+                e = self.__offset + i
                 if s > e:
                     s, e = e, s
                 notes = self.__pattern.notes
@@ -51,28 +58,36 @@ class Controller(Padget):
         return False
 
     def _buttonReleased(self, i: int) -> bool:
-        if i == self.__pressed:
+        if i < 32 and self.__offset + i == self.__pressed:
             self.__pressed = None
             return True
         return False
 
     def _render(self) -> None:
         self._pad.set(BUTTON_SCENE_1 + 3 + self.__cn, 0x033)
+        self._renderPads(range(32), self.__step_color)
+        self._renderGroup(self.__render_value)
+
+    def __step_color(self, i: int) -> int:
+        s = self.__offset + i
         notes = self.__pattern.notes
-        for i in range(32):
-            tone = notes[i].tone
-            control = notes[i].control[self.__cn]
-            if control is None and tone > 0:
-                c = 0x001
-            elif control is not None and tone > 0:
-                c = 0x032
-            elif control is not None:
-                c = 0x030
-            else:
-                c = 0x000
-            if engine.uiState.playing and engine.uiState.phase * 4 == i:
-                c |= 0x100
-            self._pad.set(i, c)
+        if s >= len(notes):
+            return 0x000
+        tone = notes[s].tone
+        control = notes[s].control[self.__cn]
+        if control is None and tone > 0:
+            c = 0x001
+        elif control is not None and tone > 0:
+            c = 0x032
+        elif control is not None:
+            c = 0x030
+        else:
+            c = 0x000
+        if engine.uiState.playing and engine.uiState.playhead(self.__tn, s):
+            c |= 0x100
+        return c
+
+    def __render_value(self) -> None:
         if self.__pressed is not None:
             cv = self.__pattern.notes[self.__pressed].control[self.__cn]
             self._pad.set(32, 0x103 if cv is None else 0x003)
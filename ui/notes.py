@@ -6,42 +6,61 @@ from launchpad import (BUTTON_DOWN, BUTTON_SCENE_1, BUTTON_UP, BUTTON_USER_1,
 from project import Pattern, Track
 
 from .padget import Padget
+from .steps import PAGE_STEPS
 
 
 class _Pattern(Padget):
-    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, tn: int, pn: int):
+    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, tn: int, pn: int, page: int):
         super().__init__(pad)
         self._pattern = pattern
         self._track = track
         self._tn = tn
         self._pn = pn
+        # first step shown
+        self._offset = page * PAGE_STEPS
+        # step of the pressed pad
+        self._pressed: Optional[int] = None
 
     def _render(self) -> None:
         self._pad.set(BUTTON_SCENE_1, 0x033)
 
+    def _step_color(self, i: int) -> int:
+        s = self._offset + i
+        if s >= len(self._pattern.notes):
+            return 0x000
+        if s == self._pressed:
+            return 0x033
+        tone = self._pattern.notes[s].tone
+        if tone == -1:
+            c = 0x003
+        elif tone == 0:
+            c = 0x000
+        else:
+            c = 0x030
+        if engine.uiState.playing and engine.uiState.playhead(self._tn, s):
+            c |= 0x100
+        return c
 
-class PercussionPattern(_Pattern):
-    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, tn: int, pn: int):
-        super().__init__(pad, pattern, track, tn, pn)
-        self.__pressed: Optional[int] = None
 
+class PercussionPattern(_Pattern):
     def _buttonPressed(self, i: int) -> bool:
-        if i < 32 and self.__pressed is None:
-            self.__pressed = i
+        if i < 32 and self._pressed is None:
+            if self._offset + i < len(self._pattern.notes):
+                self._pressed = self._offset + i
             return True
         if 40 <= i < 47:
             o = i - 37
-            if self.__pressed is not None:
-                self.__record(o, self.__pressed, True)
+            if self._pressed is not None:
+                self.__record(o, self._pressed, True)
             else:
                 if engine.recording == (self._tn, self._pn):
-                    self.__record(o, engine.tick % 32, False)
+                    self.__record(o, engine.step(self._tn), False)
                 engine.audioEngine.sendNotes(
                     self._tn, 1 + 12 * o, 128, 128, 128, 0, self._track.instrument * 2 + 3)
             return True
         if i == 47:
-            if self.__pressed is not None:
-                n = self._pattern.notes[self.__pressed]
+            if self._pressed is not None:
+                n = self._pattern.notes[self._pressed]
                 n.tone = 0 if n.tone == -1 else -1
                 n.chord = (None, None, None)
             return True
@@ -71,8 +90,8 @@ class PercussionPattern(_Pattern):
         n.chord = (cs[0], cs[1], cs[2])
 
     def _buttonReleased(self, i: int) -> bool:
-        if i == self.__pressed:
-            self.__pressed = None
+        if i < 32 and self._offset + i == self._pressed:
+            self._pressed = None
             return True
         if 40 <= i < 47 and not engine.playing:
             engine.audioEngine.sendNoteOff(
@@ -82,42 +101,29 @@ class PercussionPattern(_Pattern):
 
     def _render(self) -> None:
         super()._render()
-        notes = self._pattern.notes
-        for i in range(32):
-            if i == self.__pressed:
-                c = 0x033
-            else:
-                tone = notes[i].tone
-                if tone == -1:
-                    c = 0x003
-                elif tone == 0:
-                    c = 0x000
-                else:
-                    c = 0x030
-                if engine.uiState.playing and engine.uiState.phase * 4 == i:
-                    c |= 0x100
-            self._pad.set(i, c)
+        self._renderPads(range(32), self._step_color)
         for i in range(32, 40):
             self._pad.set(i, 0x000)
-        for i in range(40, 47):
-            self._pad.set(i, 0x133 if self.__is_pressed(
-                1 + (i - 37) * 12) else 0x033)
-        self._pad.set(47, 0x103 if self.__is_pressed(-1) else 0x003)
+        self._renderPads(range(40, 48), self.__tone_color)
         for i in range(48, 64):
             self._pad.set(i, 0x000)
 
+    def __tone_color(self, i: int) -> int:
+        if i == 47:
+            return 0x103 if self.__is_pressed(-1) else 0x003
+        return 0x133 if self.__is_pressed(1 + (i - 37) * 12) else 0x033
+
     def __is_pressed(self, t: int) -> bool:
-        if self.__pressed is not None:
-            pt = self._pattern.notes[self.__pressed].tone
-            c = self._pattern.notes[self.__pressed].chord
+        if self._pressed is not None:
+            pt = self._pattern.notes[self._pressed].tone
+            c = self._pattern.notes[self._pressed].chord
             return t in (pt, pt + (c[0] or 0), pt + (c[1] or 0), pt + (c[2] or 0))
         return False
 
 
 class MelodyPattern(_Pattern):
-    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, tn: int, pn: int):
-        super().__init__(pad, pattern, track, tn, pn)
-        self.__pressed: Optional[int] = None
+    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, tn: int, pn: int, page: int):
+        super().__init__(pad, pattern, track, tn, pn, page)
         self.__transpose = False
 
     def _buttonPressed(self, i: int) -> bool:
@@ -138,16 +144,17 @@ class MelodyPattern(_Pattern):
         if i == BUTTON_DOWN and self._pattern.octave < 8:
             self._pattern.octave += 1
             return True
-        if i < 32 and self.__pressed is None:
-            self.__pressed = i
+        if i < 32 and self._pressed is None:
+            if self._offset + i < len(self._pattern.notes):
+                self._pressed = self._offset + i
             return True
         if 32 <= i < 64:
             tone = _to_tone(i-32, self._pattern.octave)
-            if self.__pressed is not None:
-                self._pattern.notes[self.__pressed].tone = tone
+            if self._pressed is not None:
+                self._pattern.notes[self._pressed].tone = tone
             elif tone > 0:
                 if engine.recording == (self._tn, self._pn):
-                    n = self._pattern.notes[engine.tick % 32]
+                    n = self._pattern.notes[engine.step(self._tn)]
                     n.tone = tone
                     n.chord = (None, None, None)
                 engine.audioEngine.sendNotes(
@@ -159,11 +166,11 @@ class MelodyPattern(_Pattern):
         if i == BUTTON_USER_1:
             self.__transpose = False
             return True
-        if i == self.__pressed:
-            self.__pressed = None
+        if i < 32 and self._offset + i == self._pressed:
+            self._pressed = None
             return True
         if 32 <= i < 64:
-            if self.__pressed is None and _to_tone(i-32, self._pattern.octave) > 0:
+            if self._pressed is None and _to_tone(i-32, self._pattern.octave) > 0:
                 engine.audioEngine.sendNoteOff(
                     self._tn, self._track.instrument * 2 + 2)
             return True
@@ -171,28 +178,13 @@ class MelodyPattern(_Pattern):
 
     def _render(self) -> None:
         super()._render()
-        notes = self._pattern.notes
-        for i in range(32):
-            tone = notes[i].tone
-            if tone == -1:
-                c = 0x003
-            elif tone == 0:
-                c = 0x000
-            else:
-                c = 0x030
-            if engine.uiState.playing and engine.uiState.phase * 4 == i:
-                c |= 0x100
-            self._pad.set(i, c)
+        self._renderPads(range(32), self._step_color)
         self._pad.set(BUTTON_USER_1, 0x033 if self.__transpose else 0x030)
         self._pad.set(
             BUTTON_UP, 0x030 if self._pattern.octave > 0 or self.__transpose else 0x000)
         self._pad.set(
             BUTTON_DOWN, 0x030 if self._pattern.octave < 8 or self.__transpose else 0x000)
-        for i in range(32):
-            if i == self.__pressed:
-                self._pad.set(i, 0x033)
-        for i in range(32, 64):
-            self._pad.set(i, self.__keyboard_color(i-32))
+        self._renderPads(range(32, 64), lambda i: self.__keyboard_color(i - 32))
 
     def __keyboard_color(self, n: int) -> int:
         if n == 31:
@@ -209,13 +201,10 @@ class MelodyPattern(_Pattern):
         return c
 
     def __is_pressed(self, t: int) -> bool:
-        return self.__pressed is not None and self._pattern.notes[self.__pressed].tone == t
+        return self._pressed is not None and self._pattern.notes[self._pressed].tone == t
 
     def __transpose_pattern(self, i: int) -> None:
-        for n in self._pattern.notes:
-            t = n.tone
-            if t > 0:
-                n.tone = max(min(t+i, 120), 1)
+        self._pattern.transpose(i)
 
 
 def _to_tone(n: int, o: int) -> int:
@@ -1,4 +1,4 @@
-from typing import Any, Callable, TypeVar, cast
+from typing import Any, Callable, Iterable, Iterator, Tuple
 
 from mopyx import action, render
 
@@ -9,18 +9,21 @@ from model import model
 @model
 class Padget:
     def __init__(self, pad: Launchpad):
+        # names of the attributes holding child padgets (or lists of them), in
+        # order of their first assignment
+        self.__children: Tuple[str, ...] = ()
         self._pad = pad
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if isinstance(value, (Padget, list)) and name not in self.__children:
+            self.__children += (name,)
+
     @render
     def renderUi(self) -> None:
         self._render()
-        for name in self.__dict__:
-            value = getattr(self, name)
-            if not isinstance(value, list):
-                value = [value]
-            for child in value:
-                if isinstance(child, Padget):
-                    child.renderUi()
+        for child in self.__padgets():
+            child.renderUi()
 
     @action
     def buttonPressed(self, i: int) -> bool:
@@ -37,6 +40,21 @@ class Padget:
     def _render(self) -> None:
         pass
 
+    def _renderPads(self, pads: Iterable[int], color: Callable[[int], int]) -> None:
+        """
+        Sets each pad to its color in a render of its own, which runs again only
+        when a value read by color for this pad changes.
+        """
+        for i in pads:
+            _renderPad(self._pad, i, color)
+
+    def _renderGroup(self, f: Callable[[], None]) -> None:
+        """
+        Calls f in a render of its own, e.g. for a row of pads, which runs again
+        only when a value read by f changes.
+        """
+        _renderGroup(f)
+
     def _buttonPressed(self, i: int) -> bool:
         return False
 
@@ -44,10 +62,24 @@ class Padget:
         return False
 
     def __forChildren(self, f: Callable[['Padget'], Any]) -> bool:
-        for value in self.__dict__.values():
-            if not isinstance(value, list):
-                value = [value]
-            for child in value:
-                if isinstance(child, Padget) and f(child):
-                    return True
+        for child in self.__padgets():
+            if f(child):
+                return True
         return False
+
+    def __padgets(self) -> Iterator['Padget']:
+        for name in self.__children:
+            value = getattr(self, name)
+            for child in value if isinstance(value, list) else (value,):
+                if isinstance(child, Padget):
+                    yield child
+
+
+@render
+def _renderPad(pad: Launchpad, i: int, color: Callable[[int], int]) -> None:
+    pad.set(i, color(i))
+
+
+@render
+def _renderGroup(f: Callable[[], None]) -> None:
+    f()
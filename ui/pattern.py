@@ -8,6 +8,7 @@ from .chords import ChordsAndTrigger
 from .controller import Controller
 from .notes import MelodyPattern, PercussionPattern
 from .padget import Padget
+from .steps import Steps
 
 
 class Pattern(Padget):
@@ -15,8 +16,10 @@ class Pattern(Padget):
         super().__init__(pad)
         self.__track = project.tracks[t]
         self.__pattern = self.__track.patterns[p]
+        self.__pattern.load()
         self.__tn = t
         self.__pn = p
+        self.__page = 0
         self.__display = self.__create_notes()
         self.__scene = 0
         self.__record = False
@@ -24,15 +27,20 @@ class Pattern(Padget):
     def _buttonPressed(self, i: int) -> bool:
         if BUTTON_SCENE_1 <= i < BUTTON_SCENE_1 + 8:
             i -= BUTTON_SCENE_1
-            if i != self.__scene and i != 2:
+            if i != self.__scene:
+                if isinstance(self.__display, Steps):
+                    self.__page = self.__display.page
                 if i == 0:
                     self.__display = self.__create_notes()
                 elif i == 1:
                     self.__display = ChordsAndTrigger(
-                        self._pad, self.__pattern, self.__track, self.__tn)
+                        self._pad, self.__pattern, self.__track, self.__tn, self.__page)
+                elif i == 2:
+                    self.__display = Steps(
+                        self._pad, self.__pattern, self.__track, self.__page)
                 else:
                     self.__display = Controller(
-                        self._pad, self.__pattern, i - 3)
+                        self._pad, self.__pattern, self.__tn, i - 3, self.__page)
                 self.__scene = i
             return True
         if i == BUTTON_RIGHT:
@@ -58,11 +66,11 @@ class Pattern(Padget):
                       else 0x000 if engine.playing else 0x033 if self.__record else 0x030)
         self._pad.set(BUTTON_SCENE_1, 0x030)
         self._pad.set(BUTTON_SCENE_1 + 1, 0x030)
-        self._pad.set(BUTTON_SCENE_1 + 2, 0x000)
+        self._pad.set(BUTTON_SCENE_1 + 2, 0x030)
         for i in range(3, 8):
             self._pad.set(BUTTON_SCENE_1 + i, 0x030)
 
     def __create_notes(self) -> Padget:
         if self.__track.percussion:
-            return PercussionPattern(self._pad, self.__pattern, self.__track, self.__tn, self.__pn)
-        return MelodyPattern(self._pad, self.__pattern, self.__track, self.__tn, self.__pn)
+            return PercussionPattern(self._pad, self.__pattern, self.__track, self.__tn, self.__pn, self.__page)
+        return MelodyPattern(self._pad, self.__pattern, self.__track, self.__tn, self.__pn, self.__page)
@@ -67,25 +67,13 @@ class Session(Padget):
                 self.__copy_from = i
             return
         if i == self.__copy_from:
-            # clear
-            for n in p.notes:
-                n.tone = 0
-                n.chord = (None, None, None)
-                for c in range(len(n.control)):
-                    n.control[c] = None
-                n.trigger = 0
+            p.clear()
             self.__copy = False
             return
         st = project.tracks[self.__copy_from // 8]
         if t.percussion != st.percussion:
             return
-        # copy
-        sp = st.patterns[self.__copy_from % 8]
-        for m in range(len(sp.notes)):
-            p.notes[m].tone = sp.notes[m].tone
-            p.notes[m].chord = sp.notes[m].chord
-            p.notes[m].control = sp.notes[m].control.copy()
-            p.notes[m].trigger = sp.notes[m].trigger
+        p.copy_from(st.patterns[self.__copy_from % 8])
         self.__copy = False
 
     def _buttonReleased(self, i: int) -> bool:
@@ -155,6 +143,7 @@ class Preset(Padget):
             engine.audioEngine.setVolume(
                 self.__track.instrument * 2 + (3 if self.__track.percussion else 2), 0)
             self.__track.instrument = i
+            engine.loadInstruments()
             if self.__track.muted:
                 engine.audioEngine.setVolume(
                     self.__track.instrument * 2 + (3 if self.__track.percussion else 2), 0)
@@ -0,0 +1,57 @@
+from launchpad import BUTTON_SCENE_1, Launchpad
+from project import RESOLUTIONS, Pattern, Track
+
+from .padget import Padget
+
+# steps shown at once by the pattern views
+PAGE_STEPS = 32
+
+
+class Steps(Padget):
+    def __init__(self, pad: Launchpad, pattern: Pattern, track: Track, page: int):
+        super().__init__(pad)
+        self.__pattern = pattern
+        self.__track = track
+        # page shown by the other pattern views
+        self.page = page
+
+    def _buttonPressed(self, i: int) -> bool:
+        if i < 32:
+            self.__pattern.resize((i + 1) * 8)
+            self.page = min(self.page, (self.__pattern.steps - 1) // PAGE_STEPS)
+            return True
+        if 40 <= i < 40 + len(RESOLUTIONS):
+            self.__track.resolution = RESOLUTIONS[i - 40]
+            return True
+        if 56 <= i < 64:
+            if (i - 56) * PAGE_STEPS < self.__pattern.steps:
+                self.page = i - 56
+            return True
+        return False
+
+    def _render(self) -> None:
+        self._pad.set(BUTTON_SCENE_1 + 2, 0x033)
+        steps = self.__pattern.steps
+        for i in range(32):
+            if (i + 1) * 8 == steps:
+                c = 0x033
+            elif i * 8 < steps:
+                c = 0x030
+            else:
+                c = 0x010
+            self._pad.set(i, c)
+        for i in range(32, 40):
+            self._pad.set(i, 0x000)
+        for i, r in enumerate(RESOLUTIONS):
+            self._pad.set(
+                i + 40, 0x003 if r == self.__track.resolution else 0x030)
+        for i in range(40 + len(RESOLUTIONS), 56):
+            self._pad.set(i, 0x000)
+        for i in range(8):
+            if i == self.page:
+                c = 0x003
+            elif i * PAGE_STEPS < steps:
+                c = 0x030
+            else:
+                c = 0x000
+            self._pad.set(i + 56, c)
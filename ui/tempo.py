@@ -45,11 +45,20 @@ class Tempo(Padget):
 
     def _render(self) -> None:
         self._pad.set(BUTTON_LEFT, 0x033)
+        for i in range(2, 4):
+            self._pad.set(BUTTON_SCENE_1 + i, 0x000)
+        self._renderGroup(self.__render_buttons)
+        self._renderGroup(self.__render_tempo)
+        for i in range(40, 48):
+            self._pad.set(i, 0x000)
+        self._renderGroup(self.__render_swing)
+        self._renderPads(range(48, 56), self.__phase_color)
+        self._renderGroup(self.__render_latency)
+
+    def __render_buttons(self) -> None:
         self._pad.set(BUTTON_SCENE_1, 0x030 if project.tempo <= 230 else 0x000)
         self._pad.set(BUTTON_SCENE_1 + 1,
                       0x030 if project.tempo >= 50 else 0x000)
-        for i in range(2, 4):
-            self._pad.set(BUTTON_SCENE_1 + i, 0x000)
         self._pad.set(BUTTON_SCENE_1 + 4,
                       0x030 if project.swing < 24 else 0x000)
         self._pad.set(BUTTON_SCENE_1 + 5,
@@ -61,6 +70,7 @@ class Tempo(Padget):
         self._pad.set(BUTTON_UP, 0x030 if project.tempo < 240 else 0x000)
         self._pad.set(BUTTON_DOWN, 0x030 if project.tempo > 40 else 0x000)
 
+    def __render_tempo(self) -> None:
         d = _DIGITS_2[project.tempo // 100]
         for i in range(5):
             for j in range(2):
@@ -76,9 +86,7 @@ class Tempo(Padget):
             for j in range(3):
                 self._pad.set(i * 8 + j + 5, 0x003 if d[i][j] else 0x000)
 
-        for i in range(40, 48):
-            self._pad.set(i, 0x000)
-
+    def __render_swing(self) -> None:
         c, v = _to_column_and_value(project.swing)
         for i in range(c):
             self._pad.set(i + 40, 0x003)
@@ -86,12 +94,12 @@ class Tempo(Padget):
         for i in range(c + 1, 8):
             self._pad.set(i + 40, 0x000)
 
-        for i in range(project.quantum):
-            self._pad.set(
-                i + 48, 0x130 if engine.uiState.playing and engine.uiState.phase == i else 0x030)
-        for i in range(project.quantum, 8):
-            self._pad.set(i + 48, 0x000)
+    def __phase_color(self, i: int) -> int:
+        if i - 48 >= project.quantum:
+            return 0x000
+        return 0x130 if engine.uiState.playing and engine.uiState.phase == i - 48 else 0x030
 
+    def __render_latency(self) -> None:
         c, v = _to_column_and_value(project.latency)
         for i in range(c):
             self._pad.set(i + 56, 0x033)